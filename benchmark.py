@@ -0,0 +1,353 @@
+"""
+Benchmarks de desempenho com dados sintéticos (não acessa o Telegram)
+
+Uso:
+    python benchmark.py description_lookup [--sizes 10000,100000,1000000]
+    python benchmark.py caption_pairing [--sizes 10000,100000,1000000]
+    python benchmark.py downloaded_lookup [--rows 200000]   (requer DATABASE_URL)
+    python benchmark.py parallel_transfer [--size-mb 256]
+    python benchmark.py date_range [--messages 1000000]   (requer DATABASE_URL)
+    python benchmark.py history_scan [--messages 20000]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from caption_pairing import build_message_index, find_description, pair_captions
+
+
+def make_synthetic_history(count: int, video_ratio: float = 0.3, seed: int = 42) -> List[SimpleNamespace]:
+    """Gera um histórico sintético em ordem decrescente (mais recentes primeiro)"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    messages = []
+    for message_id in range(count, 0, -1):
+        roll = rng.random()
+        video = None
+        text = None
+        photo = None
+        if roll < video_ratio:
+            video = SimpleNamespace(file_size=rng.randint(1, 500) * 1024 * 1024, file_unique_id=f"uid{message_id}",
+                                    file_name=f"video_{message_id}.mp4", mime_type="video/mp4")
+        elif roll < video_ratio + 0.4:
+            text = f"**Título {message_id}** | descrição"
+        else:
+            photo = SimpleNamespace(file_unique_id=f"photo{message_id}")
+        messages.append(SimpleNamespace(
+            id=message_id,
+            date=start + timedelta(minutes=message_id),
+            text=text,
+            caption=None,
+            video=video,
+            document=None,
+            photo=photo,
+        ))
+    return messages
+
+
+def _linear_lookup(all_messages, video_message):
+    """Busca antiga: varredura linear da lista para cada vídeo"""
+    for idx, msg in enumerate(all_messages):
+        if msg.id == video_message.id:
+            return find_description(all_messages, idx)
+    return None
+
+
+def benchmark_description_lookup(sizes: List[int], linear_sample: int = 200):
+    """Compara a busca linear por vídeo com o índice message_id -> posição"""
+    print("=" * 60)
+    print("📈 Benchmark: busca de descrição por vídeo")
+    print("=" * 60)
+    for size in sizes:
+        messages = make_synthetic_history(size)
+        videos = [msg for msg in messages if msg.video]
+
+        # Busca linear: medir uma amostra e projetar para todos os vídeos
+        sample = random.Random(1).sample(videos, min(linear_sample, len(videos)))
+        started = time.perf_counter()
+        for video in sample:
+            _linear_lookup(messages, video)
+        linear_per_lookup = (time.perf_counter() - started) / len(sample)
+        linear_total = linear_per_lookup * len(videos)
+
+        # Índice: construído uma vez e reutilizado para todos os vídeos
+        started = time.perf_counter()
+        index = build_message_index(messages)
+        for video in videos:
+            find_description(messages, index[video.id])
+        indexed_total = time.perf_counter() - started
+
+        print(f"{size:>9} mensagens / {len(videos):>7} vídeos | "
+              f"linear (projetado): {linear_total:10.2f}s | indexado: {indexed_total:7.3f}s | "
+              f"ganho: {linear_total / indexed_total:,.0f}x")
+
+
+def benchmark_caption_pairing(sizes: List[int]):
+    """Compara o pareamento por vídeo (índice + janela) com o pareamento em passada única"""
+    print("=" * 60)
+    print("📈 Benchmark: pareamento de descrições para todo o histórico")
+    print("=" * 60)
+    for size in sizes:
+        messages = make_synthetic_history(size)
+
+        started = time.perf_counter()
+        index = build_message_index(messages)
+        per_video = {msg.id: find_description(messages, index[msg.id]) for msg in messages if msg.video}
+        per_video_total = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pairs = pair_captions(messages)
+        single_pass_total = time.perf_counter() - started
+
+        # Os dois métodos devem produzir exatamente o mesmo resultado
+        for paired in pairs:
+            expected = per_video[paired.video.id]
+            assert (expected[1] if expected else None) is paired.description_message
+
+        print(f"{size:>9} mensagens / {len(pairs):>7} vídeos | "
+              f"por vídeo: {per_video_total:7.3f}s | passada única: {single_pass_total:7.3f}s")
+
+
+def benchmark_downloaded_lookup(rows: int, checks: int = 5000, page_size: int = 100):
+    """Compara a verificação de "já baixado" uma consulta por vídeo vs. consultas em lote
+
+    Usa uma tabela temporária com a mesma estrutura de videos no Postgres de DATABASE_URL,
+    então não altera os dados reais.
+    """
+    from sqlalchemy import text
+    from database import engine, init_db
+
+    init_db()
+    print("=" * 60)
+    print(f"📈 Benchmark: verificação de vídeos já baixados ({rows} linhas, {checks} verificações)")
+    print("=" * 60)
+
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TEMP TABLE bench_videos (LIKE videos INCLUDING ALL)"))
+        conn.execute(text("""
+            INSERT INTO bench_videos (id, message_id, channel_name, file_name, file_path, file_size,
+                                      message_date, is_downloaded, file_unique_id)
+            SELECT g, g, CASE WHEN g % 10 = 0 THEN '@bench' ELSE '@other' || (g % 7) END,
+                   'video_' || g || '.mp4', '/app/videos/video_' || g || '.mp4', 1024,
+                   now(), true, 'uid' || g
+            FROM generate_series(1, :rows) AS g
+        """), {"rows": rows})
+        conn.execute(text("ANALYZE bench_videos"))
+
+        candidate_ids = random.Random(7).sample(range(1, rows * 2), checks)
+
+        # Uma consulta por vídeo (comportamento anterior)
+        started = time.perf_counter()
+        per_row_hits = 0
+        for message_id in candidate_ids:
+            row = conn.execute(text(
+                "SELECT file_path FROM bench_videos WHERE message_id = :id AND is_downloaded LIMIT 1"
+            ), {"id": message_id}).first()
+            per_row_hits += row is not None
+        per_row_total = time.perf_counter() - started
+
+        # Uma consulta IN (...) por página de mensagens
+        started = time.perf_counter()
+        page_hits = 0
+        for offset in range(0, len(candidate_ids), page_size):
+            page = candidate_ids[offset:offset + page_size]
+            page_hits += len(conn.execute(text(
+                "SELECT message_id FROM bench_videos WHERE message_id = ANY(:ids) AND is_downloaded"
+            ), {"ids": page}).all())
+        page_total = time.perf_counter() - started
+
+        # Conjunto pré-carregado por canal (uma única consulta)
+        started = time.perf_counter()
+        downloaded = {row[0] for row in conn.execute(text(
+            "SELECT message_id FROM bench_videos WHERE channel_name = '@bench' AND is_downloaded"
+        ))}
+        preload_hits = sum(1 for message_id in candidate_ids if message_id in downloaded)
+        preload_total = time.perf_counter() - started
+
+        conn.execute(text("DROP TABLE bench_videos"))
+
+    print(f"uma consulta por vídeo:  {per_row_total:8.3f}s ({per_row_hits} encontrados)")
+    print(f"IN por página de {page_size}:   {page_total:8.3f}s ({page_hits} encontrados)")
+    print(f"pré-carga por canal:     {preload_total:8.3f}s ({preload_hits} encontrados no canal)")
+
+
+def benchmark_parallel_transfer(size_mb: int = 256, latency: float = 0.02):
+    """Compara o fluxo único com partes paralelas usando uma mídia falsa com latência por bloco"""
+    import asyncio
+    import tempfile
+    from fake_telegram import FakeMediaSource
+    from transfer import CHUNK_SIZE, download_parallel, download_resumable
+
+    print("=" * 60)
+    print(f"📈 Benchmark: transferência de {size_mb}MB (latência simulada de {latency * 1000:.0f}ms por bloco)")
+    print("=" * 60)
+    source = FakeMediaSource(size=size_mb * CHUNK_SIZE, latency=latency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        target = os.path.join(directory, "video.mp4")
+        started = time.perf_counter()
+        asyncio.run(download_resumable(source, target, target + ".part", len(source.data)))
+        single_total = time.perf_counter() - started
+        print(f"fluxo único:            {single_total:7.2f}s")
+
+        for connections in (2, 4, 8):
+            os.remove(target)
+            started = time.perf_counter()
+            asyncio.run(download_parallel(source, target, target + ".part", len(source.data), connections=connections))
+            parallel_total = time.perf_counter() - started
+            print(f"{connections} partes paralelas:     {parallel_total:7.2f}s ({single_total / parallel_total:.1f}x)")
+
+
+def benchmark_date_range(count: int = 1000000, latency: float = 0.05, days: int = 1):
+    """Compara formas de buscar as mensagens de um período em um canal simulado com count mensagens
+
+    - varredura a partir da mensagem mais nova (sem salto)
+    - salto por offset_date e paginação até o início do período
+    - janela de IDs obtida do índice esparso de datas (get_messages em lotes)
+
+    O canal falso não espera de verdade: o tempo é estimado a partir do número de chamadas à API
+    com a latência informada. O índice é gravado no Postgres de DATABASE_URL e removido no final.
+    """
+    import asyncio
+    import tempfile
+    from sqlalchemy import text
+    from database import engine
+    from date_index import DateIndex
+    from fake_telegram import FakeChannel
+    from video_downloader import VideoDownloader
+
+    channel = FakeChannel(count, interval=timedelta(minutes=1), deleted_every=53)
+    seek_name, index_name = "__bench_date_seek__", "__bench_date_index__"
+    print("=" * 60)
+    print(f"📈 Benchmark: consulta de {days} dia(s) em um canal de {count} mensagens "
+          f"({latency * 1000:.0f}ms por chamada)")
+    print("=" * 60)
+
+    async def scan_range(start, end):
+        messages = []
+        async for message in channel.get_chat_history(channel.chat.id):
+            if message.date < start:
+                break
+            if message.date <= end:
+                messages.append(message)
+        return messages
+
+    async def measure(fetch, start, end):
+        requests_before = channel.requests
+        served_before = channel.messages_served
+        started = time.perf_counter()
+        messages = await fetch(channel.chat.id, start, end)
+        elapsed = time.perf_counter() - started
+        requests = channel.requests - requests_before
+        return messages, requests, channel.messages_served - served_before, elapsed + requests * latency
+
+    async def run(directory):
+        seek = VideoDownloader(channel, seek_name, videos_path=directory)
+        indexed = VideoDownloader(channel, index_name, videos_path=directory)
+
+        # Índice montado como efeito colateral de uma varredura completa
+        started = time.perf_counter()
+        index = DateIndex(index_name)
+        for message_id in range(count, 0, -1):
+            if not channel._is_deleted(message_id):
+                index.observe(SimpleNamespace(id=message_id, date=channel.date_of(message_id)))
+        await index.flush()
+        print(f"índice montado: {count // index.spacing} amostras em {time.perf_counter() - started:.2f}s\n")
+
+        for age in (0.01, 0.5, 0.99):
+            end = channel.date_of(int(count * (1 - age)))
+            start = end - timedelta(days=days)
+            print(f"período {start:%d/%m/%Y %H:%M} - {end:%d/%m/%Y %H:%M} (mensagens ~{age:.0%} antigas)")
+            expected = None
+            for label, fetch in (("varredura sem salto", lambda chat_id, s, e: scan_range(s, e)),
+                                 ("salto por offset_date", seek._fetch_history_range),
+                                 ("índice de datas", indexed._fetch_history_range)):
+                messages, requests, served, estimated = await measure(fetch, start, end)
+                ids = [message.id for message in messages]
+                expected = expected if expected is not None else ids
+                assert ids == expected, label
+                print(f"   {label:<22} {len(ids):>6} mensagens | {requests:>6} chamadas | "
+                      f"{served:>8} transferidas | ~{estimated:8.2f}s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            asyncio.run(run(directory))
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM message_date_index WHERE channel_name IN (:seek, :indexed)"),
+                             {"seek": seek_name, "indexed": index_name})
+
+
+def benchmark_history_scan(count: int = 20000, latency: float = 0.05):
+    """Compara a paginação sequencial de get_chat_history com a varredura paralela por faixas de IDs
+    em um canal simulado (latência real por chamada, 1 em cada 50 mensagens apagada)"""
+    import asyncio
+    from fake_telegram import FakeChannel
+    from history_scanner import get_newest_message_id, scan_history_by_ids
+
+    print("=" * 60)
+    print(f"📈 Benchmark: varredura completa de {count} mensagens ({latency * 1000:.0f}ms por chamada)")
+    print("=" * 60)
+
+    async def sequential(channel):
+        return [message.id async for message in channel.get_chat_history(channel.chat.id)]
+
+    async def parallel(channel, concurrency):
+        newest_id = await get_newest_message_id(channel, channel.chat.id)
+        return [message.id async for message in
+                scan_history_by_ids(channel, channel.chat.id, newest_id, concurrency=concurrency)]
+
+    async def run():
+        channel = FakeChannel(count, deleted_every=50, page_latency=latency)
+        started = time.perf_counter()
+        expected = await sequential(channel)
+        sequential_total = time.perf_counter() - started
+        print(f"get_chat_history sequencial:  {sequential_total:7.2f}s ({channel.requests} chamadas)")
+
+        for concurrency in (1, 4, 8):
+            channel = FakeChannel(count, deleted_every=50, page_latency=latency)
+            started = time.perf_counter()
+            ids = await parallel(channel, concurrency)
+            parallel_total = time.perf_counter() - started
+            assert ids == expected
+            print(f"faixas de IDs, {concurrency} em paralelo: {parallel_total:7.2f}s ({channel.requests} chamadas, "
+                  f"{sequential_total / parallel_total:.1f}x)")
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Telegram Video Downloader")
+    parser.add_argument("benchmark", choices=["description_lookup", "caption_pairing", "downloaded_lookup",
+                                              "parallel_transfer", "date_range", "history_scan"])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="Tamanhos do histórico sintético separados por vírgula")
+    parser.add_argument("--rows", type=int, default=200000,
+                        help="Linhas sintéticas na tabela temporária (downloaded_lookup)")
+    parser.add_argument("--size-mb", type=int, default=256,
+                        help="Tamanho do arquivo simulado em MB (parallel_transfer)")
+    parser.add_argument("--messages", type=int,
+                        help="Mensagens no canal simulado (date_range: 1000000, history_scan: 20000)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    if args.benchmark == "description_lookup":
+        benchmark_description_lookup(sizes)
+    elif args.benchmark == "caption_pairing":
+        benchmark_caption_pairing(sizes)
+    elif args.benchmark == "downloaded_lookup":
+        benchmark_downloaded_lookup(args.rows)
+    elif args.benchmark == "parallel_transfer":
+        benchmark_parallel_transfer(args.size_mb)
+    elif args.benchmark == "date_range":
+        benchmark_date_range(args.messages or 1000000)
+    elif args.benchmark == "history_scan":
+        benchmark_history_scan(args.messages or 20000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Pareamento de vídeos com suas descrições (mensagens de texto/legenda próximas)
+
+Funciona com qualquer registro de mensagem que exponha os atributos usados pelo
+Pyrogram (id, text, caption, video, document), inclusive objetos simples de teste.
+"""
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Quantas mensagens mais antigas e mais recentes são consideradas ao procurar a descrição
+OLDER_WINDOW = 10
+NEWER_WINDOW = 5
+
+
+class PairedVideo(NamedTuple):
+    """Vídeo com a descrição encontrada (ou None) e a mensagem de onde ela veio"""
+    video: Any
+    description: Optional[str]
+    description_message: Optional[Any]
+
+
+def get_message_text(message: Any) -> Optional[str]:
+    """Texto da mensagem: message.text ou message.caption (legenda de foto)"""
+    return message.text or getattr(message, 'caption', None)
+
+
+def is_video_message(message: Any) -> bool:
+    """Verifica se a mensagem é um vídeo ou documento de vídeo"""
+    document = message.document
+    return bool(message.video or (document and document.mime_type and "video" in document.mime_type))
+
+
+def is_description_candidate(message: Any) -> bool:
+    """Mensagem com texto (pode ter foto/imagem junto) que não é vídeo"""
+    message_text = get_message_text(message)
+    return bool(message_text and message_text.strip()) and not is_video_message(message)
+
+
+def build_message_index(messages: List[Any]) -> Dict[int, int]:
+    """Constrói o índice message_id -> posição na lista (uma única passada)"""
+    return {msg.id: idx for idx, msg in enumerate(messages)}
+
+
+def find_description(all_messages: List[Any], video_index: int) -> Optional[Tuple[str, Any]]:
+    """Busca a descrição do vídeo que está na posição video_index da lista
+    Retorna uma tupla (descrição, mensagem) ou None se não encontrar"""
+    # As mensagens vêm em ordem decrescente (mais recentes primeiro): índices maiores são
+    # mais antigos. Primeiro procurar nas mais antigas, depois nas mais recentes
+    for i in range(1, OLDER_WINDOW + 1):
+        next_index = video_index + i
+        if next_index >= len(all_messages):
+            break
+        if is_description_candidate(all_messages[next_index]):
+            return (get_message_text(all_messages[next_index]), all_messages[next_index])
+
+    for i in range(1, NEWER_WINDOW + 1):
+        prev_index = video_index - i
+        if prev_index < 0:
+            break
+        if is_description_candidate(all_messages[prev_index]):
+            return (get_message_text(all_messages[prev_index]), all_messages[prev_index])
+
+    return None
+
+
+def pair_captions(messages: List[Any]) -> List[PairedVideo]:
+    """Pareia todos os vídeos do histórico com suas descrições em uma única passada (O(n))
+
+    As mensagens devem estar em ordem decrescente (mais recentes primeiro), como retornadas
+    por get_chat_history. Aplica as mesmas regras de find_description: a mensagem de texto
+    mais próxima entre as OLDER_WINDOW mais antigas e, se não houver, entre as NEWER_WINDOW
+    mais recentes. Os vídeos são retornados na mesma ordem do histórico.
+    """
+    count = len(messages)
+    candidates = [is_description_candidate(msg) for msg in messages]
+
+    # Posição do candidato mais antigo mais próximo (varredura do fim para o início)
+    nearest_older = [None] * count
+    following = None
+    for idx in range(count - 1, -1, -1):
+        nearest_older[idx] = following
+        if candidates[idx]:
+            following = idx
+
+    pairs = []
+    preceding = None  # Candidato mais recente mais próximo (varredura do início para o fim)
+    for idx, msg in enumerate(messages):
+        if is_video_message(msg):
+            match = None
+            older = nearest_older[idx]
+            if older is not None and older - idx <= OLDER_WINDOW:
+                match = older
+            elif preceding is not None and idx - preceding <= NEWER_WINDOW:
+                match = preceding
+
+            if match is not None:
+                pairs.append(PairedVideo(msg, get_message_text(messages[match]), messages[match]))
+            else:
+                pairs.append(PairedVideo(msg, None, None))
+        if candidates[idx]:
+            preceding = idx
+
+    return pairs
+
+
+class StreamingCaptionPairer:
+    """Pareamento incremental para históricos recebidos em fluxo (mais recentes primeiro)
+
+    Mantém apenas uma janela deslizante de NEWER_WINDOW mensagens já vistas e os vídeos
+    ainda sem descrição (no máximo OLDER_WINDOW), então a memória é constante qualquer que
+    seja o tamanho do canal. Produz exatamente os mesmos pares que pair_captions.
+    """
+
+    def __init__(self):
+        # Últimas mensagens vistas (mais recentes que a mensagem atual), como (mensagem, é_candidata)
+        self._recent = deque(maxlen=NEWER_WINDOW)
+        # Vídeos aguardando mensagens mais antigas: [vídeo, candidata mais recente, mensagens restantes]
+        self._pending = deque()
+
+    def feed(self, message: Any) -> List[PairedVideo]:
+        """Processa a próxima mensagem (mais antiga) e retorna os vídeos que ficaram resolvidos"""
+        candidate = is_description_candidate(message)
+        resolved = []
+
+        if candidate:
+            # A mensagem atual é a candidata mais antiga mais próxima de todos os vídeos pendentes
+            description = get_message_text(message)
+            while self._pending:
+                video, _, _ = self._pending.popleft()
+                resolved.append(PairedVideo(video, description, message))
+        else:
+            for entry in self._pending:
+                entry[2] -= 1
+            # Os vídeos mais antigos na fila são os primeiros a esgotar a janela
+            while self._pending and self._pending[0][2] == 0:
+                resolved.append(self._fallback(self._pending.popleft()))
+
+        if is_video_message(message):
+            newer = next((msg for msg, is_candidate in reversed(self._recent) if is_candidate), None)
+            self._pending.append([message, newer, OLDER_WINDOW])
+
+        self._recent.append((message, candidate))
+        return resolved
+
+    def flush(self) -> List[PairedVideo]:
+        """Fim do histórico: resolve os vídeos pendentes usando as mensagens mais recentes"""
+        resolved = [self._fallback(entry) for entry in self._pending]
+        self._pending.clear()
+        return resolved
+
+    @staticmethod
+    def _fallback(entry: list) -> PairedVideo:
+        video, newer, _ = entry
+        if newer is None:
+            return PairedVideo(video, None, None)
+        return PairedVideo(video, get_message_text(newer), newer)
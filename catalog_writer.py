@@ -0,0 +1,135 @@
+"""
+Gravação em lote dos registros de vídeos baixados na tabela videos
+"""
+import asyncio
+import inspect
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Union
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from database import Video, run_db
+
+# Colunas que um novo download sem esse dado (por exemplo, um vídeo baixado de novo pela fila,
+# sem a mensagem de descrição) não apaga do registro existente
+PRESERVED_COLUMNS = ("description", "image_path")
+
+# Quantidade de registros acumulados que dispara uma gravação
+CATALOG_BATCH_SIZE = int(os.getenv("CATALOG_BATCH_SIZE", "50"))
+# Intervalo máximo (em segundos) que um registro fica no buffer antes de ser gravado
+CATALOG_FLUSH_INTERVAL = float(os.getenv("CATALOG_FLUSH_INTERVAL", "2"))
+# Tentativas de gravação do que restou no buffer ao encerrar (close), com espera crescente
+CATALOG_CLOSE_ATTEMPTS = int(os.getenv("CATALOG_CLOSE_ATTEMPTS", "3"))
+
+
+class CatalogWriter:
+    """Acumula registros de vídeos concluídos e grava em lotes (por quantidade ou tempo)
+
+    Use start() antes de um download em lote e close() ao final (inclusive em interrupções)
+    para garantir que nenhum download concluído fique fora do catálogo. Se a gravação falhar
+    (banco indisponível, conexão perdida), os registros voltam para o buffer e são gravados na
+    próxima tentativa. on_write, se informado, recebe os registros de cada lote depois de gravados
+    (pode ser uma função assíncrona).
+    """
+
+    def __init__(self, batch_size: int = CATALOG_BATCH_SIZE, flush_interval: float = CATALOG_FLUSH_INTERVAL,
+                 on_write: Optional[Callable[[List[dict]], Union[None, Awaitable[None]]]] = None):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_write = on_write
+        self._buffer: List[dict] = []
+        self._last_flush = time.monotonic()
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Inicia a gravação periódica do buffer"""
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def add(self, values: dict):
+        """Adiciona um registro (colunas de Video) ao buffer, gravando se o lote estiver cheio"""
+        self._buffer.append(values)
+        if len(self._buffer) >= self.batch_size:
+            try:
+                await self.flush()
+            except Exception as e:
+                # O lote continua no buffer: a gravação periódica ou close() tenta de novo
+                print(f"⚠️  Erro ao gravar vídeos no banco (será tentado de novo): {e}")
+
+    async def flush(self):
+        """Grava imediatamente todos os registros do buffer"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            try:
+                written = await run_db(lambda db: self._write(db, records))
+            except Exception:
+                # Nada se perde: o lote volta para o início do buffer (a gravação é um upsert, repetir é seguro)
+                self._buffer[:0] = records
+                raise
+            if self.on_write is not None and written:
+                result = self.on_write(written)
+                if inspect.isawaitable(result):
+                    await result
+
+    async def close(self):
+        """Interrompe a gravação periódica e grava o que restou no buffer
+        Lança a exceção da última tentativa se o banco continuar indisponível"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for attempt in range(1, max(1, CATALOG_CLOSE_ATTEMPTS) + 1):
+            try:
+                await self.flush()
+                return
+            except Exception as e:
+                if attempt >= CATALOG_CLOSE_ATTEMPTS:
+                    raise
+                print(f"⚠️  Erro ao gravar vídeos no banco (tentativa {attempt}/{CATALOG_CLOSE_ATTEMPTS}): {e}")
+                await asyncio.sleep(2 ** attempt)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"⚠️  Erro ao gravar vídeos no banco: {e}")
+
+    def _write(self, db, records: List[dict]) -> List[dict]:
+        """Grava os registros em um único INSERT ... ON CONFLICT; se o lote falhar, grava um a um
+        Retorna os registros gravados. Erros que não são do registro (conexão) são propagados"""
+        try:
+            db.execute(self._upsert(records))
+            db.commit()
+            return records
+        except DBAPIError:
+            db.rollback()
+
+        # Algum registro viola outra restrição (ou a conexão caiu): gravar individualmente para não perder o lote
+        written = []
+        for record in records:
+            try:
+                db.execute(self._upsert([record]))
+                db.commit()
+                written.append(record)
+            except IntegrityError as e:
+                db.rollback()
+                print(f"⚠️  Não foi possível registrar o vídeo {record['message_id']} no banco: {e.orig}")
+        return written
+
+    @staticmethod
+    def _upsert(records: List[dict]):
+        statement = insert(Video).values(records)
+        set_ = {column: statement.excluded[column] for column in records[0] if column not in ("channel_name", "message_id")}
+        for column in PRESERVED_COLUMNS:
+            if column in set_:
+                set_[column] = func.coalesce(statement.excluded[column], Video.__table__.c[column])
+        return statement.on_conflict_do_update(constraint="uq_videos_channel_message", set_=set_)
@@ -0,0 +1,159 @@
+"""
+Cache persistente de chats/canais resolvidos (tabela chat_cache)
+
+Guarda ID, access hash, título e tipo de cada chat resolvido para que as próximas execuções
+não precisem chamar get_chat nem percorrer todos os diálogos. As entradas expiram após
+CHAT_CACHE_TTL_HOURS horas e podem ser renovadas explicitamente (list_channels.py --refresh).
+"""
+import os
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional, Union
+
+from pyrogram import Client
+
+from database import ChatCacheEntry, run_db
+
+CHAT_CACHE_TTL = timedelta(hours=float(os.getenv("CHAT_CACHE_TTL_HOURS", "24")))
+
+# Tipos usados pelo armazenamento de peers da sessão do Pyrogram
+_PEER_TYPES = {"CHANNEL": "channel", "SUPERGROUP": "supergroup", "GROUP": "group", "BOT": "bot", "PRIVATE": "user"}
+
+
+class ChatType(NamedTuple):
+    """Tipo do chat com o mesmo formato de acesso de pyrogram.enums.ChatType (.name)"""
+    name: str
+
+
+class CachedChat(NamedTuple):
+    """Chat lido do cache, com os atributos de pyrogram.types.Chat usados pela aplicação"""
+    id: int
+    title: Optional[str]
+    username: Optional[str]
+    type: ChatType
+    is_broadcast: bool
+    is_verified: bool
+    access_hash: Optional[int]
+
+
+def cache_key(channel: Union[int, str]) -> str:
+    """Chave do cache para o canal como configurado (ID numérico ou username)"""
+    key = str(channel).strip()
+    return key.lower() if not key.lstrip("-").isdigit() else key
+
+
+def _type_name(chat) -> str:
+    return chat.type.name if hasattr(chat.type, "name") else str(chat.type)
+
+
+def _to_cached_chat(entry: ChatCacheEntry) -> CachedChat:
+    return CachedChat(
+        id=entry.chat_id,
+        title=entry.title,
+        username=entry.username,
+        type=ChatType(entry.chat_type or ""),
+        is_broadcast=bool(entry.is_broadcast),
+        is_verified=bool(entry.is_verified),
+        access_hash=entry.access_hash,
+    )
+
+
+def _is_fresh(entry: ChatCacheEntry) -> bool:
+    return entry.resolved_at is not None and datetime.utcnow() - entry.resolved_at < CHAT_CACHE_TTL
+
+
+async def get_cached_chat(channel: Union[int, str]) -> Optional[CachedChat]:
+    """Chat resolvido anteriormente, se a entrada ainda estiver dentro do TTL"""
+    key = cache_key(channel)
+    entry = await run_db(lambda db: db.get(ChatCacheEntry, key))
+    if entry is None or not _is_fresh(entry):
+        return None
+    return _to_cached_chat(entry)
+
+
+async def _access_hash(client: Client, chat) -> Optional[int]:
+    """Access hash do chat conforme guardado na sessão do Pyrogram (sem chamadas à API)
+    Lê o armazenamento da sessão diretamente: resolve_peer buscaria na API um peer ausente dele"""
+    try:
+        peer = await client.storage.get_peer_by_id(chat.id)
+    except Exception:
+        return None
+    return getattr(peer, "access_hash", None)
+
+
+def _entry_values(chat, access_hash: Optional[int], from_dialogs: bool) -> dict:
+    return dict(
+        chat_id=chat.id,
+        access_hash=access_hash,
+        title=chat.title,
+        username=chat.username,
+        chat_type=_type_name(chat),
+        is_broadcast=bool(getattr(chat, "is_broadcast", False)),
+        is_verified=bool(getattr(chat, "is_verified", False)),
+        from_dialogs=from_dialogs,
+        resolved_at=datetime.utcnow(),
+    )
+
+
+async def store_chat(client: Client, channel: Union[int, str], chat) -> CachedChat:
+    """Grava o chat resolvido no cache (pela chave configurada e pelo ID)"""
+    values = _entry_values(chat, await _access_hash(client, chat), from_dialogs=False)
+    keys = {cache_key(channel), str(chat.id)}
+    if chat.username:
+        keys.add(cache_key(f"@{chat.username}"))
+
+    def store(db):
+        for key in keys:
+            existing = db.get(ChatCacheEntry, key)
+            # Não retirar da lista de diálogos uma entrada gravada pelo list_channels.py
+            from_dialogs = bool(existing and existing.from_dialogs)
+            db.merge(ChatCacheEntry(lookup_key=key, **{**values, "from_dialogs": from_dialogs}))
+        db.commit()
+
+    await run_db(store)
+    return CachedChat(chat.id, chat.title, chat.username, ChatType(values["chat_type"]),
+                      values["is_broadcast"], values["is_verified"], values["access_hash"])
+
+
+async def restore_peer(client: Client, chat: CachedChat):
+    """Garante que o peer está na sessão do Pyrogram (por exemplo, após limpar a sessão),
+    usando o access hash guardado, para que o ID possa ser usado sem resolver de novo"""
+    if chat.access_hash is None:
+        return
+    try:
+        await client.storage.get_peer_by_id(chat.id)
+    except KeyError:
+        peer_type = _PEER_TYPES.get(chat.type.name, "channel")
+        await client.storage.update_peers([(chat.id, chat.access_hash, peer_type, chat.username, None)])
+
+
+async def get_cached_dialogs() -> Optional[List[CachedChat]]:
+    """Lista de diálogos salva pela última listagem completa (None se vazia ou expirada)"""
+    entries = await run_db(lambda db: db.query(ChatCacheEntry).filter(ChatCacheEntry.from_dialogs.is_(True)).all())
+    if not entries or not all(_is_fresh(entry) for entry in entries):
+        return None
+    return [_to_cached_chat(entry) for entry in entries]
+
+
+async def store_dialogs(client: Client, chats: list):
+    """Substitui a lista de diálogos em cache pelo resultado de uma listagem completa"""
+    rows = []
+    for chat in chats:
+        values = _entry_values(chat, await _access_hash(client, chat), from_dialogs=True)
+        rows.append(ChatCacheEntry(lookup_key=str(chat.id), **values))
+
+    def store(db):
+        db.query(ChatCacheEntry).filter(ChatCacheEntry.from_dialogs.is_(True)).delete()
+        for row in rows:
+            db.merge(row)
+        db.commit()
+
+    await run_db(store)
+
+
+async def clear_chat_cache():
+    """Remove todas as entradas do cache (renovação explícita)"""
+    def clear(db):
+        db.query(ChatCacheEntry).delete()
+        db.commit()
+
+    await run_db(clear)
@@ -0,0 +1,78 @@
+"""
+Índice esparso data -> ID de mensagem (tabela message_date_index)
+
+Toda varredura do histórico registra uma mensagem amostrada a cada DATE_INDEX_SPACING IDs.
+Como os IDs de um canal crescem com a data, uma consulta por período usa as amostras vizinhas
+para obter a janela de IDs [lower_id, upper_id] que contém o período, e as mensagens podem ser
+buscadas diretamente pelos IDs em vez de paginar o histórico.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+
+from sqlalchemy.dialects.postgresql import insert
+
+from database import MessageDateIndex, run_db
+
+# Distância (em IDs) entre as amostras do índice
+DATE_INDEX_SPACING = int(os.getenv("DATE_INDEX_SPACING", "100"))
+
+
+class DateIndex:
+    """Índice esparso data -> ID de mensagem de um canal"""
+
+    def __init__(self, channel_name: Union[str, int], spacing: int = DATE_INDEX_SPACING):
+        self.channel_name = str(channel_name)
+        self.spacing = spacing
+        # Amostras ainda não gravadas (bloco -> (message_id, data))
+        self._pending: Dict[int, Tuple[int, datetime]] = {}
+
+    def observe(self, message: Any):
+        """Registra a mensagem lida em uma varredura, se for a primeira vista em seu bloco de IDs"""
+        if getattr(message, "empty", False) or message.date is None:
+            return
+        bucket = message.id // self.spacing
+        if bucket not in self._pending:
+            self._pending[bucket] = (message.id, message.date)
+
+    async def flush(self):
+        """Grava as amostras pendentes (amostras já existentes são mantidas)"""
+        if not self._pending:
+            return
+        rows = [dict(channel_name=self.channel_name, bucket=bucket, message_id=message_id, date=date)
+                for bucket, (message_id, date) in self._pending.items()]
+        self._pending = {}
+
+        def store(db):
+            db.execute(insert(MessageDateIndex).on_conflict_do_nothing(), rows)
+            db.commit()
+
+        await run_db(store)
+
+    async def id_window(self, start: datetime, end: datetime) -> Optional[Tuple[int, int]]:
+        """Janela de IDs (exclusiva) que contém todas as mensagens entre start e end:
+        retorna (lower_id, upper_id) com lower_id anterior a start e upper_id posterior a end,
+        ou None se o índice não cobrir o período com amostras próximas das duas bordas"""
+        def load(db):
+            query = db.query(MessageDateIndex.message_id).filter(MessageDateIndex.channel_name == self.channel_name)
+
+            def first(condition, order):
+                row = query.filter(condition).order_by(order).first()
+                return row.message_id if row else None
+
+            return (
+                first(MessageDateIndex.date < start, MessageDateIndex.date.desc()),
+                first(MessageDateIndex.date >= start, MessageDateIndex.date.asc()),
+                first(MessageDateIndex.date <= end, MessageDateIndex.date.desc()),
+                first(MessageDateIndex.date > end, MessageDateIndex.date.asc()),
+            )
+
+        lower_id, first_inside, last_inside, upper_id = await run_db(load)
+        if lower_id is None or upper_id is None:
+            return None
+        # As bordas só são precisas se houver amostras dos dois lados de cada uma
+        # (sem isso a janela poderia incluir milhares de mensagens fora do período)
+        max_gap = 2 * self.spacing
+        if (first_inside or upper_id) - lower_id > max_gap or upper_id - (last_inside or lower_id) > max_gap:
+            return None
+        return lower_id, upper_id
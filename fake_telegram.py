@@ -0,0 +1,166 @@
+"""
+Fontes falsas do Telegram para testes locais e benchmarks (não acessam a rede)
+"""
+import asyncio
+import math
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import AsyncIterator, List, Optional, Union
+
+from transfer import CHUNK_SIZE
+
+
+class FakeMediaSource:
+    """Mídia em memória que se comporta como stream_media (blocos de 1 MiB, offset/limit em blocos)
+
+    latency simula o tempo de ida e volta de cada bloco; fail_at_chunk faz a primeira leitura
+    desse bloco falhar, para testar a retomada.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, size: int = 0, latency: float = 0.0,
+                 fail_at_chunk: Optional[int] = None):
+        self.data = data if data is not None else os.urandom(size)
+        self.latency = latency
+        self.fail_at_chunk = fail_at_chunk
+        self.chunks_served = 0
+
+    def __call__(self, offset: int, limit: int) -> AsyncIterator[bytes]:
+        return self._stream(offset, limit)
+
+    async def _stream(self, offset: int, limit: int) -> AsyncIterator[bytes]:
+        index = offset
+        last = (len(self.data) + CHUNK_SIZE - 1) // CHUNK_SIZE
+        if limit:
+            last = min(last, offset + limit)
+        while index < last:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if index == self.fail_at_chunk:
+                self.fail_at_chunk = None
+                raise ConnectionError(f"falha simulada no bloco {index}")
+            self.chunks_served += 1
+            yield self.data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+            index += 1
+
+
+class FakeChannel:
+    """Canal sintético que responde como um Client do Pyrogram (get_chat, get_chat_history,
+    get_messages), gerando as mensagens sob demanda para simular históricos de milhões de mensagens
+
+    A mensagem N tem data start + N * interval; a cada video_every mensagens há um vídeo,
+    precedido por uma mensagem de texto com o título. Com deleted_every, os IDs múltiplos desse
+    valor foram apagados. page_latency simula o tempo de ida e volta de cada chamada à API e,
+    com flood_every, uma a cada flood_every chamadas falha com FloodWait de flood_wait segundos.
+    Os vídeos têm video_size bytes, servidos por stream_media.
+    """
+
+    PAGE_SIZE = 100
+
+    def __init__(self, count: int, video_every: int = 10, start: datetime = datetime(2020, 1, 1),
+                 interval: timedelta = timedelta(minutes=5), deleted_every: int = 0,
+                 page_latency: float = 0.0, chat_id: int = -1001234567890, title: str = "Canal falso",
+                 flood_every: int = 0, flood_wait: int = 1, video_size: int = 1024 * 1024):
+        self.count = count
+        self.video_every = video_every
+        self.start = start
+        self.interval = interval
+        self.deleted_every = deleted_every
+        self.page_latency = page_latency
+        self.flood_every = flood_every
+        self.flood_wait = flood_wait
+        self.video_size = video_size
+        self.chat = SimpleNamespace(id=chat_id, title=title, username=None, type=SimpleNamespace(name="CHANNEL"),
+                                    is_broadcast=True, is_verified=False)
+        # Chamadas feitas à "API" e mensagens devolvidas (para os benchmarks)
+        self.requests = 0
+        self.messages_served = 0
+        self.flood_waits = 0
+
+    def date_of(self, message_id: int) -> datetime:
+        return self.start + self.interval * message_id
+
+    def _is_deleted(self, message_id: int) -> bool:
+        return bool(self.deleted_every) and message_id % self.deleted_every == 0
+
+    def message(self, message_id: int) -> SimpleNamespace:
+        """Mensagem com o ID informado (vazia se apagada ou inexistente)"""
+        if not 1 <= message_id <= self.count or self._is_deleted(message_id):
+            return SimpleNamespace(id=message_id, empty=True, date=None, text=None, caption=None,
+                                   video=None, document=None, photo=None)
+        video = None
+        text = None
+        if message_id % self.video_every == 0:
+            video = SimpleNamespace(file_id=f"file-{message_id}", file_unique_id=f"unique-{message_id}",
+                                    file_size=self.video_size, mime_type="video/mp4", file_name=f"video_{message_id}.mp4")
+        elif message_id % self.video_every == self.video_every - 1:
+            text = f"**Título {message_id + 1}**\nDescrição do vídeo {message_id + 1}"
+        else:
+            text = f"Mensagem {message_id}"
+        return SimpleNamespace(id=message_id, empty=False, date=self.date_of(message_id), text=text, caption=None,
+                               video=video, document=None, photo=None)
+
+    async def _call(self):
+        self.requests += 1
+        if self.page_latency:
+            await asyncio.sleep(self.page_latency)
+        if self.flood_every and self.requests % self.flood_every == 0:
+            from pyrogram.errors import FloodWait
+            self.flood_waits += 1
+            raise FloodWait(value=self.flood_wait)
+
+    async def get_chat(self, chat_id: Union[int, str]):
+        await self._call()
+        return self.chat
+
+    async def resolve_peer(self, chat_id: Union[int, str]):
+        return SimpleNamespace(channel_id=chat_id)
+
+    async def get_messages(self, chat_id: Union[int, str], message_ids: Union[int, List[int]]):
+        await self._call()
+        if isinstance(message_ids, int):
+            return self.message(message_ids)
+        messages = [self.message(message_id) for message_id in message_ids]
+        self.messages_served += len(messages)
+        return messages
+
+    async def get_chat_history(self, chat_id: Union[int, str], limit: int = 0, offset: int = 0,
+                               offset_id: int = 0, offset_date: Optional[datetime] = None):
+        """Mensagens em ordem decrescente, em páginas de PAGE_SIZE (como o Pyrogram)"""
+        newest = self.count
+        if offset_id:
+            newest = min(newest, offset_id - 1)
+        if offset_date is not None and offset_date > self.start:
+            # Última mensagem com data anterior a offset_date
+            newest = min(newest, math.ceil((offset_date - self.start) / self.interval) - 1)
+        elif offset_date is not None:
+            newest = 0
+        newest -= offset
+        returned = 0
+        while newest >= 1:
+            await self._call()
+            page = []
+            message_id = newest
+            while message_id >= 1 and len(page) < self.PAGE_SIZE:
+                if not self._is_deleted(message_id):
+                    page.append(self.message(message_id))
+                message_id -= 1
+            newest = message_id
+            self.messages_served += len(page)
+            for message in page:
+                yield message
+                returned += 1
+                if limit and returned >= limit:
+                    return
+
+    async def stream_media(self, message, limit: int = 0, offset: int = 0) -> AsyncIterator[bytes]:
+        """Conteúdo determinístico do vídeo em blocos de CHUNK_SIZE (offset e limit em blocos)"""
+        size = message.video.file_size
+        last = (size + CHUNK_SIZE - 1) // CHUNK_SIZE
+        if limit:
+            last = min(last, offset + limit)
+        for index in range(offset, last):
+            await self._call()
+            start = index * CHUNK_SIZE
+            pattern = f"{message.id}:{index};".encode()
+            yield (pattern * (CHUNK_SIZE // len(pattern) + 1))[:min(CHUNK_SIZE, size - start)]
@@ -0,0 +1,60 @@
+"""
+Varredura paralela do histórico por faixas de IDs
+
+Em vez de paginar get_chat_history (uma página por ida e volta), divide o intervalo de IDs em
+lotes de até GET_MESSAGES_LIMIT IDs e busca vários lotes ao mesmo tempo com get_messages.
+As mensagens são entregues em ordem decrescente de ID, como get_chat_history, para que o
+pareamento de descrições funcione igual; IDs apagados ou inexistentes são ignorados.
+"""
+import asyncio
+import os
+from collections import deque
+from typing import Any, AsyncIterator, List, Union
+
+# Máximo de IDs por chamada get_messages aceito pela API do Telegram
+GET_MESSAGES_LIMIT = 200
+
+# Lotes de IDs buscados ao mesmo tempo (1 = paginação sequencial com get_chat_history)
+HISTORY_SCAN_CONCURRENCY = int(os.getenv("HISTORY_SCAN_CONCURRENCY", "4"))
+
+
+async def get_newest_message_id(client, chat_id: Union[int, str]) -> int:
+    """ID da mensagem mais recente do chat (0 se o chat estiver vazio)"""
+    async for message in client.get_chat_history(chat_id, limit=1):
+        return message.id
+    return 0
+
+
+async def scan_history_by_ids(client, chat_id: Union[int, str], newest_id: int, oldest_id: int = 1,
+                              concurrency: int = HISTORY_SCAN_CONCURRENCY,
+                              batch_size: int = GET_MESSAGES_LIMIT) -> AsyncIterator[Any]:
+    """Produz as mensagens com ID entre oldest_id e newest_id (inclusive), da mais nova para a mais antiga
+
+    Mantém até concurrency lotes em andamento à frente do consumidor: o próximo lote só é pedido
+    quando o mais antigo em andamento é entregue, então a memória usada é limitada.
+    """
+    def batches():
+        for batch_newest in range(newest_id, oldest_id - 1, -batch_size):
+            yield list(range(batch_newest, max(oldest_id, batch_newest - batch_size + 1) - 1, -1))
+
+    async def fetch(ids: List[int]) -> List[Any]:
+        messages = await client.get_messages(chat_id, ids)
+        return [message for message in messages if message is not None and not message.empty]
+
+    pending = deque()
+    batch_iter = batches()
+    try:
+        for ids in batch_iter:
+            pending.append(asyncio.ensure_future(fetch(ids)))
+            if len(pending) >= max(1, concurrency):
+                break
+        while pending:
+            messages = await pending.popleft()
+            next_ids = next(batch_iter, None)
+            if next_ids is not None:
+                pending.append(asyncio.ensure_future(fetch(next_ids)))
+            for message in sorted(messages, key=lambda message: message.id, reverse=True):
+                yield message
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,135 @@
+"""
+Verificação de integridade dos vídeos baixados
+
+Cada download concluído tem o tamanho conferido com file_size e o SHA-256 calculado em um pool
+de threads (leituras de HASH_BUFFER_SIZE; o hashlib libera o GIL durante o cálculo), fora do
+loop de eventos. O digest fica na coluna sha256 da tabela videos.
+
+verify_library (python jobs.py verify) confere a biblioteca inteira em paralelo: arquivos ausentes,
+com tamanho diferente ou com digest diferente deixam de contar como baixados e voltam para a
+fila de downloads (python jobs.py run ou worker.py).
+"""
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from database import Video, run_db
+from job_queue import DownloadJobQueue
+
+# Arquivos lidos/conferidos ao mesmo tempo
+INTEGRITY_WORKERS = int(os.getenv("INTEGRITY_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Tamanho de cada leitura ao calcular o digest
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+_hash_executor = ThreadPoolExecutor(max_workers=max(1, INTEGRITY_WORKERS), thread_name_prefix="hash")
+
+
+def sha256_file(file_path: str) -> str:
+    """SHA-256 do arquivo, lido em blocos de HASH_BUFFER_SIZE em um buffer reaproveitado"""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+async def hash_file(file_path: str) -> str:
+    """SHA-256 calculado no pool de threads, sem bloquear o loop de eventos"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, sha256_file, file_path)
+
+
+def check_size(file_path: str, expected_size: Optional[int]) -> Optional[str]:
+    """Descrição do problema (arquivo ausente ou tamanho diferente) ou None se estiver correto"""
+    if not os.path.exists(file_path):
+        return "arquivo não encontrado"
+    size = os.path.getsize(file_path)
+    if expected_size and size != expected_size:
+        return f"tamanho {size} diferente do esperado ({expected_size} bytes)"
+    return None
+
+
+async def verify_download(file_path: str, expected_size: Optional[int]) -> str:
+    """Confere o tamanho de um arquivo recém-baixado e retorna o seu SHA-256
+    Lança IOError se o arquivo estiver ausente ou com tamanho diferente de expected_size"""
+    problem = check_size(file_path, expected_size)
+    if problem:
+        raise IOError(f"verificação de integridade falhou: {problem}")
+    return await hash_file(file_path)
+
+
+async def verify_library(channel_name: Optional[str] = None, quick: bool = False,
+                         workers: int = INTEGRITY_WORKERS) -> dict:
+    """Confere todos os vídeos baixados (de um canal ou de todos) e devolve à fila os divergentes
+
+    Com quick, confere apenas a existência e o tamanho. Vídeos ainda sem digest (anteriores à
+    verificação ou reaproveitados de outro arquivo) passam a ter o digest registrado.
+    """
+    def load(db):
+        query = db.query(Video.id, Video.channel_name, Video.message_id, Video.file_path, Video.file_size,
+                         Video.sha256, Video.description).filter(Video.is_downloaded.is_(True))
+        if channel_name is not None:
+            query = query.filter(Video.channel_name == channel_name)
+        return query.order_by(Video.id).all()
+
+    rows = await run_db(load)
+    summary = {"checked": 0, "ok": 0, "hashed": 0, "mismatched": 0, "requeued": 0}
+    print(f"🔎 Verificando {len(rows)} vídeos ({workers} em paralelo{', apenas tamanho' if quick else ''})...")
+
+    semaphore = asyncio.Semaphore(max(1, workers))
+    digests: List[dict] = []
+    mismatches: List[Tuple[object, str]] = []
+
+    async def check(row):
+        async with semaphore:
+            problem = await asyncio.get_running_loop().run_in_executor(
+                _hash_executor, check_size, row.file_path, row.file_size)
+            digest = None
+            if not problem and not quick:
+                digest = await hash_file(row.file_path)
+                if row.sha256 and digest != row.sha256:
+                    problem = "conteúdo diferente do digest registrado"
+        summary["checked"] += 1
+        if problem:
+            print(f"❌ Vídeo {row.message_id} ({row.channel_name}): {problem}")
+            mismatches.append((row, problem))
+            return
+        summary["ok"] += 1
+        if digest and not row.sha256:
+            summary["hashed"] += 1
+        digests.append({"id": row.id, "sha256": digest or row.sha256, "verified_at": now})
+        if summary["checked"] % 500 == 0:
+            print(f"  {summary['checked']}/{len(rows)} verificados")
+
+    now = datetime.utcnow()
+    await asyncio.gather(*(check(row) for row in rows))
+
+    def save(db):
+        if digests:
+            # Atualização em lote pela chave primária
+            db.execute(update(Video), digests)
+        if mismatches:
+            # O arquivo será baixado de novo; o pós-processamento também precisa ser refeito
+            db.query(Video).filter(Video.id.in_([row.id for row, _ in mismatches])).update(dict(
+                is_downloaded=False, verified_at=now, media_processed_at=None), synchronize_session=False)
+        db.commit()
+
+    await run_db(save)
+
+    by_channel: Dict[str, List[Tuple[int, Optional[str], str]]] = {}
+    for row, problem in mismatches:
+        by_channel.setdefault(row.channel_name, []).append((row.message_id, row.description, problem))
+    for channel, entries in by_channel.items():
+        await DownloadJobQueue(channel).requeue(entries)
+    summary["mismatched"] = len(mismatches)
+    summary["requeued"] = len(mismatches)
+    return summary
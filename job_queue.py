@@ -0,0 +1,358 @@
+"""
+Fila persistente de downloads (tabela download_jobs)
+
+Cada vídeo encontrado por uma varredura vira um job pending antes do download (depois
+running, done ou failed).
+Um download que falha volta para pending com espera exponencial (JOB_RETRY_BASE_SECONDS,
+dobrando a cada tentativa, até JOB_RETRY_MAX_SECONDS); após JOB_MAX_ATTEMPTS tentativas
+fica como failed até ser reenviado explicitamente (python jobs.py retry-failed).
+
+Vários processos (workers) podem consumir a mesma fila: cada um reivindica jobs com
+SELECT ... FOR UPDATE SKIP LOCKED e recebe um lease de JOB_LEASE_SECONDS, renovado por
+heartbeat enquanto o download está em andamento. Se o worker morrer, o lease vence e o job
+volta a ser reivindicável por outro worker.
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from caption_pairing import PairedVideo
+from database import DownloadJob, run_db
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "60"))
+JOB_RETRY_MAX_SECONDS = int(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+# Identificação deste processo nos leases (único por container/processo)
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Validade do lease; o heartbeat o renova a cada terço desse tempo
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Espera antes da próxima tentativa, dobrando a cada tentativa já feita"""
+    return timedelta(seconds=min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)))
+
+
+def _lease_expiry(now: datetime) -> datetime:
+    return now + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def _lease_expired(now: datetime):
+    """Lease vencido (worker que morreu) ou inexistente (job running gravado antes dos leases)"""
+    return or_(DownloadJob.lease_expires_at < now, DownloadJob.lease_expires_at.is_(None))
+
+
+def _claimable(now: datetime):
+    """Jobs pendentes cuja espera venceu ou em andamento com lease vencido"""
+    return or_(
+        and_(DownloadJob.status == "pending", DownloadJob.next_attempt_at <= now),
+        and_(DownloadJob.status == "running", _lease_expired(now)),
+    )
+
+
+async def claim_jobs(limit: Optional[int] = None, channel_name: Optional[str] = None,
+                     worker_id: str = WORKER_ID) -> List[DownloadJob]:
+    """Reivindica até limit jobs (de um canal ou de todos) para este worker
+
+    Linhas travadas por outro worker no mesmo instante são puladas (SKIP LOCKED), então
+    vários workers podem reivindicar ao mesmo tempo sem pegar o mesmo job.
+    """
+    def claim(db) -> List[DownloadJob]:
+        now = datetime.utcnow()
+        candidates = select(DownloadJob.id).where(_claimable(now))
+        if channel_name is not None:
+            candidates = candidates.where(DownloadJob.channel_name == channel_name)
+        candidates = candidates.order_by(DownloadJob.message_id.desc()).limit(limit).with_for_update(skip_locked=True)
+        jobs = db.scalars(
+            update(DownloadJob)
+            .where(DownloadJob.id.in_(candidates.scalar_subquery()))
+            .values(status="running", attempts=DownloadJob.attempts + 1, next_attempt_at=None,
+                    lease_owner=worker_id, lease_expires_at=_lease_expiry(now), updated_at=now)
+            .returning(DownloadJob),
+            execution_options={"synchronize_session": False},
+        ).all()
+        db.commit()
+        return sorted(jobs, key=lambda job: job.message_id, reverse=True)
+
+    return await run_db(claim)
+
+
+class DownloadJobQueue:
+    """Fila de downloads de um canal, vista por um worker"""
+
+    def __init__(self, channel_name: Union[str, int], worker_id: str = WORKER_ID):
+        self.channel_name = str(channel_name)
+        self.worker_id = worker_id
+        # Jobs com lease deste worker (message_id), renovados pelo heartbeat
+        self._active: Set[int] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def _job_filter(self, db, message_ids: Iterable[int]):
+        return db.query(DownloadJob).filter(
+            DownloadJob.channel_name == self.channel_name,
+            DownloadJob.message_id.in_(list(message_ids)),
+        )
+
+    async def enqueue(self, paired_videos: List[PairedVideo]):
+        """Coloca vídeos na fila como pending (jobs já existentes não são alterados)"""
+        if not paired_videos:
+            return
+        now = datetime.utcnow()
+        rows = [dict(
+            channel_name=self.channel_name,
+            message_id=paired.video.id,
+            status="pending",
+            attempts=0,
+            next_attempt_at=now,
+            description=paired.description,
+            description_message_id=paired.description_message.id if paired.description_message else None,
+            created_at=now,
+            updated_at=now,
+        ) for paired in paired_videos]
+
+        def enqueue(db):
+            db.execute(insert(DownloadJob).on_conflict_do_nothing(constraint="uq_download_jobs_channel_message"), rows)
+            db.commit()
+
+        await run_db(enqueue)
+
+    async def requeue(self, entries: List[Tuple[int, Optional[str], str]]):
+        """Devolve vídeos para a fila como pending, com as tentativas zeradas (por exemplo, arquivo
+        corrompido encontrado na verificação); entries: (message_id, descrição, motivo)"""
+        if not entries:
+            return
+        now = datetime.utcnow()
+        rows = [dict(
+            channel_name=self.channel_name,
+            message_id=message_id,
+            status="pending",
+            attempts=0,
+            next_attempt_at=now,
+            last_error=reason,
+            description=description,
+            created_at=now,
+            updated_at=now,
+        ) for message_id, description, reason in entries]
+
+        def requeue(db):
+            stmt = insert(DownloadJob)
+            db.execute(stmt.on_conflict_do_update(
+                constraint="uq_download_jobs_channel_message",
+                set_=dict(status="pending", attempts=0, next_attempt_at=now, last_error=stmt.excluded.last_error,
+                          lease_owner=None, lease_expires_at=None, updated_at=now),
+            ), rows)
+            db.commit()
+
+        await run_db(requeue)
+
+    async def claim(self, limit: Optional[int] = None) -> List[DownloadJob]:
+        """Reivindica os jobs do canal que podem ser processados agora"""
+        jobs = await claim_jobs(limit, self.channel_name, self.worker_id)
+        self.track(job.message_id for job in jobs)
+        return jobs
+
+    def track(self, message_ids: Iterable[int]):
+        """Passa a renovar o lease dos jobs reivindicados por este worker"""
+        self._active.update(message_ids)
+
+    async def renew(self, message_id: int) -> bool:
+        """Renova o lease de um job reivindicado antes do download
+        Retorna False se o lease venceu e o job foi reivindicado por outro worker"""
+        def renew(db) -> bool:
+            count = self._job_filter(db, [message_id]).filter(
+                DownloadJob.status == "running",
+                DownloadJob.lease_owner == self.worker_id,
+            ).update(dict(lease_expires_at=_lease_expiry(datetime.utcnow())), synchronize_session=False)
+            db.commit()
+            return count > 0
+
+        renewed = await run_db(renew)
+        if not renewed:
+            self._active.discard(message_id)
+        return renewed
+
+    async def start(self, paired: PairedVideo) -> bool:
+        """Registra o início de uma tentativa de download (criando o job se ainda não existir)
+        Retorna False se outro worker estiver com o job no momento"""
+        now = datetime.utcnow()
+        description_message = paired.description_message
+        values = dict(
+            channel_name=self.channel_name,
+            message_id=paired.video.id,
+            status="running",
+            attempts=1,
+            next_attempt_at=None,
+            description=paired.description,
+            description_message_id=description_message.id if description_message else None,
+            lease_owner=self.worker_id,
+            lease_expires_at=_lease_expiry(now),
+            created_at=now,
+            updated_at=now,
+        )
+
+        def start(db) -> bool:
+            stmt = insert(DownloadJob).values(**values)
+            result = db.execute(stmt.on_conflict_do_update(
+                constraint="uq_download_jobs_channel_message",
+                set_=dict(
+                    status="running",
+                    attempts=DownloadJob.attempts + 1,
+                    next_attempt_at=None,
+                    description=stmt.excluded.description,
+                    description_message_id=stmt.excluded.description_message_id,
+                    lease_owner=self.worker_id,
+                    lease_expires_at=stmt.excluded.lease_expires_at,
+                    updated_at=now,
+                ),
+                where=or_(DownloadJob.status != "running", _lease_expired(now),
+                          DownloadJob.lease_owner == self.worker_id),
+            ))
+            db.commit()
+            return result.rowcount > 0
+
+        started = await run_db(start)
+        if started:
+            self._active.add(paired.video.id)
+        return started
+
+    async def finish(self, message_id: int, succeeded: bool, error: Optional[str] = None) -> Optional[str]:
+        """Registra o resultado da tentativa; retorna o novo status do job (None se não houver job)
+        Se o lease foi perdido para outro worker, o job não é alterado"""
+        self._active.discard(message_id)
+
+        def finish(db) -> Optional[str]:
+            job = self._job_filter(db, [message_id]).first()
+            if job is None:
+                return None
+            if job.lease_owner != self.worker_id:
+                return job.status
+            now = datetime.utcnow()
+            if succeeded:
+                job.status = "done"
+                job.last_error = None
+            elif job.attempts >= JOB_MAX_ATTEMPTS:
+                job.status = "failed"
+                job.last_error = error
+            else:
+                job.status = "pending"
+                job.last_error = error
+                job.next_attempt_at = now + retry_delay(job.attempts)
+            job.lease_owner = None
+            job.lease_expires_at = None
+            job.updated_at = now
+            db.commit()
+            return job.status
+
+        return await run_db(finish)
+
+    async def finish_succeeded(self, message_ids: List[int]):
+        """Marca como done os jobs deste worker cujos vídeos já foram gravados no catálogo
+        (jobs cujo lease passou para outro worker não são alterados)"""
+        if not message_ids:
+            return
+        self._active.difference_update(message_ids)
+
+        def finish(db):
+            self._job_filter(db, message_ids).filter(DownloadJob.lease_owner == self.worker_id).update(dict(
+                status="done", last_error=None, lease_owner=None, lease_expires_at=None,
+                updated_at=datetime.utcnow()), synchronize_session=False)
+            db.commit()
+
+        await run_db(finish)
+
+    async def give_up(self, message_id: int, error: str):
+        """Marca o job como failed sem novas tentativas (por exemplo, mensagem apagada)"""
+        self._active.discard(message_id)
+
+        def give_up(db):
+            self._job_filter(db, [message_id]).update(dict(
+                status="failed", last_error=error, lease_owner=None, lease_expires_at=None,
+                updated_at=datetime.utcnow()), synchronize_session=False)
+            db.commit()
+
+        await run_db(give_up)
+
+    async def mark_done(self, message_ids: List[int]):
+        """Marca como concluídos jobs cujos vídeos já estão no catálogo"""
+        if not message_ids:
+            return
+        self._active.difference_update(message_ids)
+
+        def mark(db):
+            self._job_filter(db, message_ids).update(dict(
+                status="done", last_error=None, lease_owner=None, lease_expires_at=None,
+                updated_at=datetime.utcnow()), synchronize_session=False)
+            db.commit()
+
+        await run_db(mark)
+
+    async def retry_failed(self) -> int:
+        """Devolve os jobs failed para a fila, com as tentativas zeradas; retorna quantos"""
+        def retry(db) -> int:
+            count = db.query(DownloadJob).filter(
+                DownloadJob.channel_name == self.channel_name,
+                DownloadJob.status == "failed",
+            ).update(dict(status="pending", attempts=0, next_attempt_at=datetime.utcnow(),
+                          updated_at=datetime.utcnow()))
+            db.commit()
+            return count
+
+        return await run_db(retry)
+
+    async def heartbeat(self):
+        """Renova o lease de todos os jobs em andamento deste worker"""
+        if not self._active:
+            return
+        message_ids = list(self._active)
+
+        def renew(db):
+            now = datetime.utcnow()
+            self._job_filter(db, message_ids).filter(
+                DownloadJob.status == "running",
+                DownloadJob.lease_owner == self.worker_id,
+            ).update(dict(lease_expires_at=_lease_expiry(now)), synchronize_session=False)
+            db.commit()
+
+        await run_db(renew)
+
+    def start_heartbeat(self):
+        """Inicia a renovação periódica dos leases (enquanto houver downloads em andamento)"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_periodically())
+
+    async def stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    async def _heartbeat_periodically(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"⚠️  Erro ao renovar os leases da fila de downloads: {e}")
+
+
+async def job_counts() -> Dict[str, Dict[str, int]]:
+    """Quantidade de jobs por canal e status"""
+    def load(db):
+        return db.query(DownloadJob.channel_name, DownloadJob.status, func.count()).group_by(
+            DownloadJob.channel_name, DownloadJob.status).all()
+
+    counts: Dict[str, Dict[str, int]] = {}
+    for channel_name, status, count in await run_db(load):
+        counts.setdefault(channel_name, dict.fromkeys(JOB_STATUSES, 0))[status] = count
+    return counts
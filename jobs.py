@@ -0,0 +1,92 @@
+"""
+Fila de downloads: consulta e reprocessamento sem percorrer o histórico
+
+Uso:
+    docker-compose run --rm app python jobs.py status                  # jobs por canal e status
+    docker-compose run --rm app python jobs.py run [--channel X]       # downloads pendentes cuja espera venceu
+    docker-compose run --rm app python jobs.py retry-failed [--channel X]   # reenvia os que esgotaram as tentativas
+    docker-compose run --rm app python jobs.py verify [--channel X] [--quick]   # confere os arquivos baixados
+
+Sem --channel, processa todos os canais que têm jobs na fila.
+"""
+import argparse
+import asyncio
+import sys
+from dotenv import load_dotenv
+from database import init_db
+from integrity import verify_library
+from job_queue import JOB_STATUSES, job_counts
+from media_processing import media_processor
+from telegram_client import TelegramClient, load_credentials, parse_channel_name
+from video_downloader import VideoDownloader
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+async def show_status() -> int:
+    """Mostra a quantidade de jobs por canal e status"""
+    init_db()
+    counts = await job_counts()
+    if not counts:
+        print("ℹ️  A fila de downloads está vazia")
+        return 0
+
+    print("=" * 60)
+    print("📋 Fila de downloads")
+    print("=" * 60)
+    for channel_name, by_status in sorted(counts.items()):
+        print(f"{channel_name}: " + ", ".join(f"{by_status[status]} {status}" for status in JOB_STATUSES))
+    return 0
+
+async def verify(channel: str = None, quick: bool = False) -> int:
+    """Confere tamanho e SHA-256 de todos os vídeos baixados e devolve à fila os divergentes"""
+    init_db()
+    summary = await verify_library(channel, quick=quick)
+    print(f"\n🔎 Verificação: {summary['ok']} íntegros ({summary['hashed']} com digest registrado agora), "
+          f"{summary['mismatched']} com problema")
+    if summary["requeued"]:
+        print(f"🔁 {summary['requeued']} vídeos voltaram para a fila de downloads (python jobs.py run)")
+    return 1 if summary["mismatched"] else 0
+
+async def run_jobs(channel: str = None, include_failed: bool = False) -> int:
+    """Processa a fila do canal informado (ou de todos os canais com jobs)"""
+    init_db()
+    channels = [channel] if channel else sorted(await job_counts())
+    if not channels:
+        print("ℹ️  A fila de downloads está vazia")
+        return 0
+
+    credentials = load_credentials()
+    if not credentials:
+        return 1
+
+    client = TelegramClient(*credentials)
+    await client.connect()
+
+    failed = 0
+    try:
+        for channel_name in channels:
+            downloader = VideoDownloader(client.client, parse_channel_name(channel_name))
+            summary = await downloader.process_jobs(include_failed=include_failed)
+            if summary is None:
+                print(f"ℹ️  Nenhum download pendente para {channel_name}")
+            else:
+                failed += summary["failed"]
+        await media_processor.close()
+    finally:
+        await client.disconnect()
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fila persistente de downloads")
+    parser.add_argument("command", choices=["status", "run", "retry-failed", "verify"])
+    parser.add_argument("--channel", help="Canal (ID ou username) como configurado no download")
+    parser.add_argument("--quick", action="store_true", help="verify: conferir apenas existência e tamanho")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        sys.exit(asyncio.run(show_status()))
+    if args.command == "verify":
+        sys.exit(asyncio.run(verify(args.channel, args.quick)))
+    sys.exit(asyncio.run(run_jobs(args.channel, include_failed=args.command == "retry-failed")))
@@ -1,14 +1,35 @@
+import argparse
 import asyncio
 import os
 from dotenv import load_dotenv
 from pyrogram import Client
 from pyrogram.types import Chat
+from chat_cache import clear_chat_cache, get_cached_dialogs, store_dialogs
+from database import init_db
+from rate_limiter import RateLimitedClient
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-async def list_channels():
-    """Lista todos os canais que o usuário faz parte"""
+def _chat_info(chat) -> dict:
+    """Dados exibidos de um chat (do Telegram ou do cache)"""
+    return {
+        'id': chat.id,
+        'title': chat.title,
+        'username': chat.username if chat.username else None,
+        'type': chat.type.name if hasattr(chat.type, 'name') else str(chat.type),
+        'is_broadcast': getattr(chat, 'is_broadcast', False),
+        'is_verified': getattr(chat, 'is_verified', False),
+        'is_scam': getattr(chat, 'is_scam', False),
+        'is_fake': getattr(chat, 'is_fake', False)
+    }
+
+async def list_channels(refresh: bool = False):
+    """Lista todos os canais que o usuário faz parte
+    
+    Args:
+        refresh: Ignora a lista em cache e percorre novamente todos os diálogos
+    """
     print("=" * 60)
     print("📱 Listando Canais do Telegram")
     print("=" * 60)
@@ -27,8 +48,21 @@ async def list_channels():
         print("❌ Erro: TELEGRAM_API_ID deve ser um número!")
         return
     
-    # Conectar ao Telegram
-    client = Client(
+    # O cache é opcional: sem banco acessível, a lista vem direto do Telegram
+    cache_available = True
+    cached_dialogs = None
+    try:
+        init_db()
+        if refresh:
+            await clear_chat_cache()
+        else:
+            cached_dialogs = await get_cached_dialogs()
+    except Exception as e:
+        cache_available = False
+        print(f"⚠️  Cache de canais indisponível ({e}); buscando a lista no Telegram")
+    
+    # Conectar ao Telegram apenas se a lista precisar ser (re)carregada
+    client = None if cached_dialogs is not None else Client(
         "telegram_session",
         api_id=api_id,
         api_hash=api_hash,
@@ -36,35 +70,35 @@ async def list_channels():
     )
     
     try:
-        await client.start()
-        print("✅ Conectado ao Telegram com sucesso!\n")
-        
-        print("🔍 Buscando canais e grupos...\n")
+        if cached_dialogs is not None:
+            print("💾 Usando lista de canais em cache (use --refresh para atualizar)\n")
+            chats = cached_dialogs
+        else:
+            await client.start()
+            print("✅ Conectado ao Telegram com sucesso!\n")
+            
+            print("🔍 Buscando canais e grupos...\n")
+            
+            # Buscar todos os diálogos (pelo limitador de chamadas, com espera em FloodWait)
+            chats = [dialog.chat async for dialog in RateLimitedClient(client).get_dialogs()]
+            if cache_available:
+                try:
+                    await store_dialogs(client, chats)
+                except Exception as e:
+                    print(f"⚠️  Erro ao salvar canais no cache: {e}")
         
         channels = []
         groups = []
         all_chats = []
         
-        # Buscar todos os diálogos
-        async for dialog in client.get_dialogs():
-            chat = dialog.chat
-            chat_info = {
-                'id': chat.id,
-                'title': chat.title,
-                'username': chat.username if chat.username else None,
-                'type': chat.type.name if hasattr(chat.type, 'name') else str(chat.type),
-                'is_broadcast': getattr(chat, 'is_broadcast', False),
-                'is_verified': getattr(chat, 'is_verified', False),
-                'is_scam': getattr(chat, 'is_scam', False),
-                'is_fake': getattr(chat, 'is_fake', False)
-            }
-            
+        for chat in chats:
+            chat_info = _chat_info(chat)
             all_chats.append(chat_info)
             
             # Separar canais e grupos
-            if chat.type.name == "CHANNEL":
+            if chat_info['type'] == "CHANNEL":
                 channels.append(chat_info)
-            elif chat.type.name in ["GROUP", "SUPERGROUP"]:
+            elif chat_info['type'] in ["GROUP", "SUPERGROUP"]:
                 groups.append(chat_info)
         
         # Ordenar por nome (tratando casos onde title pode ser None)
@@ -159,8 +193,12 @@ async def list_channels():
         import traceback
         traceback.print_exc()
     finally:
-        await client.stop()
-        print("\n👋 Desconectado do Telegram")
+        if client is not None and client.is_connected:
+            await client.stop()
+            print("\n👋 Desconectado do Telegram")
 
 if __name__ == "__main__":
-    asyncio.run(list_channels())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Lista os canais e grupos da conta do Telegram")
+    parser.add_argument("--refresh", action="store_true", help="Ignora o cache e busca os diálogos novamente no Telegram")
+    args = parser.parse_args()
+    asyncio.run(list_channels(refresh=args.refresh))
\ No newline at end of file
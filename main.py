@@ -4,6 +4,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from telegram_client import TelegramClient
 from video_downloader import VideoDownloader
+from media_processing import media_processor
+from caption_pairing import pair_captions
 from clear_session import clear_session
 
 # Carregar variáveis de ambiente
@@ -88,11 +90,13 @@ async def main():
             print("=" * 60)
             print("1. Baixar vídeos por data")
             print("2. Baixar todo o conteúdo do canal")
+            print("3. Sincronizar apenas vídeos novos (incremental)")
+            print("4. Tentar novamente os downloads que falharam")
             print("0. Sair")
             print("=" * 60)
             
             try:
-                choice = input("\nEscolha uma opção (0, 1 ou 2): ").strip()
+                choice = input("\nEscolha uma opção (0, 1, 2, 3 ou 4): ").strip()
             except KeyboardInterrupt:
                 print("\n\n⚠️  Operação cancelada pelo usuário.")
                 choice = "0"
@@ -131,7 +135,7 @@ async def main():
                         if "peer id invalid" in error_str or "chat not found" in error_str or "not found" in error_str or "invalid" in error_str:
                             print("\n💡 Possíveis soluções:")
                             print("   1. Verifique se você tem acesso ao canal")
-                            print("   2. Execute: docker-compose run --rm app python list_channels.py")
+                            print("   2. Execute: docker-compose run --rm app python list_channels.py --refresh")
                             print("   3. Verifique se o ID do canal está correto no .env")
                             print(f"      Canal configurado: {CHANNEL_NAME}")
                         else:
@@ -179,12 +183,12 @@ async def main():
                             RED = "\033[31m"
                             RESET = "\033[0m"
                             
+                            # Parear todos os vídeos com suas descrições em uma única passada
+                            descriptions = {paired.video.id: paired.description for paired in pair_captions(filtered_messages)}
+                            
                             for idx, video_msg in enumerate(video_messages, 1):
-                                # Buscar descrição para exibir como título
-                                description_result = await downloader.get_description_from_previous_message(filtered_messages, video_msg)
-                                description = None
-                                if description_result:
-                                    description, _ = description_result
+                                # Usar a descrição pareada para exibir como título
+                                description = descriptions.get(video_msg.id)
                                 title = downloader.extract_video_title(description) if description else None
                                 date_str = video_msg.date.strftime("%d/%m/%Y")
                                 
@@ -279,13 +283,22 @@ async def main():
                         traceback.print_exc()
             elif choice == "2":
                 await downloader.download_all_videos()
+            elif choice == "3":
+                await downloader.sync_new_videos()
+            elif choice == "4":
+                if await downloader.process_jobs(include_failed=True) is None:
+                    print("ℹ️  Nenhum download pendente na fila.")
             else:
-                print("❌ Opção inválida! Por favor, escolha 0, 1 ou 2.")
+                print("❌ Opção inválida! Por favor, escolha 0, 1, 2, 3 ou 4.")
                 continue
+            
+            # O menu bloqueia o loop de eventos: concluir o pós-processamento antes de voltar a ele
+            await media_processor.drain()
     
     except KeyboardInterrupt:
         print("\n\n⚠️  Operação cancelada pelo usuário.")
     finally:
+        await media_processor.close()
         try:
             await client.disconnect()
         except:
@@ -0,0 +1,276 @@
+"""
+Pós-processamento dos vídeos baixados com ffprobe/ffmpeg, em um pool de processos
+
+Para cada vídeo: extrai duração, resolução e codecs para a tabela videos, gera uma imagem de
+capa (poster) e, para MP4, reorganiza o arquivo com faststart (moov no início) para permitir
+reprodução em streaming. Os comandos rodam em até MEDIA_WORKERS processos (padrão: número de
+CPUs), fora do loop de eventos, então os downloads continuam enquanto os vídeos são processados.
+
+A fila é a própria tabela videos: vídeos com media_processed_at nulo ainda estão pendentes, então
+o processamento interrompido é retomado na próxima execução (python process_media.py). Passos já
+feitos (poster existente, arquivo já com faststart) não são refeitos.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import update
+
+from database import Video, run_db
+from integrity import sha256_file
+
+# Processamento automático após cada download (o processamento pendente pode rodar depois com process_media.py)
+MEDIA_PROCESSING = os.getenv("MEDIA_PROCESSING", "false").lower() in ("1", "true", "yes", "sim")
+# Processos simultâneos de ffprobe/ffmpeg
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", str(os.cpu_count() or 1)))
+# Largura da imagem de capa (a altura acompanha a proporção)
+POSTER_WIDTH = int(os.getenv("POSTER_WIDTH", "640"))
+# Tempo máximo (em segundos) de cada comando ffprobe/ffmpeg
+MEDIA_COMMAND_TIMEOUT = int(os.getenv("MEDIA_COMMAND_TIMEOUT", "1800"))
+
+# Extensões reorganizadas com faststart (contêiner MP4/QuickTime)
+FASTSTART_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+
+def media_tools_available() -> bool:
+    return shutil.which("ffprobe") is not None and shutil.which("ffmpeg") is not None
+
+
+def poster_path_for(file_path: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}_poster.jpg"
+
+
+def is_faststart(file_path: str) -> Optional[bool]:
+    """Se o átomo moov vem antes de mdat (None se o arquivo não parecer um MP4)"""
+    with open(file_path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size = int.from_bytes(header[:4], "big")
+            box_type = header[4:8]
+            if box_type == b"moov":
+                return True
+            if box_type == b"mdat":
+                return False
+            if size == 1:
+                size = int.from_bytes(f.read(8), "big") - 8
+            elif size == 0:
+                return None
+            if size < 8:
+                return None
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+def _run(command: List[str]) -> str:
+    result = subprocess.run(command, capture_output=True, text=True, timeout=MEDIA_COMMAND_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"{command[0]} falhou: {result.stderr.strip()[-500:]}")
+    return result.stdout
+
+
+def probe_media(file_path: str) -> dict:
+    """Duração, resolução e codecs do arquivo (ffprobe)"""
+    output = _run(["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", file_path])
+    info = json.loads(output or "{}")
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+    duration = info.get("format", {}).get("duration") or video.get("duration")
+    return {
+        "duration": float(duration) if duration else None,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+    }
+
+
+def make_poster(file_path: str, duration: Optional[float]) -> str:
+    """Imagem de capa a partir de um quadro no início do vídeo (não é refeita se já existir)"""
+    poster_path = poster_path_for(file_path)
+    if os.path.exists(poster_path):
+        return poster_path
+    # 10% do vídeo, no máximo 10s: evita telas pretas de abertura sem decodificar muito
+    position = min(10.0, duration * 0.1) if duration else 0.0
+    temp_path = f"{poster_path}.part.jpg"
+    _run(["ffmpeg", "-v", "error", "-y", "-ss", f"{position:.2f}", "-i", file_path, "-frames:v", "1",
+          "-vf", f"scale={POSTER_WIDTH}:-2", temp_path])
+    os.replace(temp_path, poster_path)
+    return poster_path
+
+
+def remux_faststart(file_path: str) -> Optional[bool]:
+    """Reorganiza o MP4 com o moov no início, sem recodificar; retorna se o arquivo tem faststart
+    (None se o formato não se aplica)
+
+    Arquivos com mais de um hardlink (vídeos reaproveitados por deduplicação) não são alterados:
+    substituir o arquivo separaria os links e o catálogo dos outros vídeos ficaria desatualizado.
+    """
+    if not file_path.lower().endswith(FASTSTART_EXTENSIONS):
+        return None
+    current = is_faststart(file_path)
+    if current is None or current or os.stat(file_path).st_nlink > 1:
+        return current
+    temp_path = f"{file_path}.faststart.part"
+    try:
+        _run(["ffmpeg", "-v", "error", "-y", "-i", file_path, "-map", "0", "-c", "copy",
+              "-movflags", "+faststart", "-f", "mp4", temp_path])
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def process_file(file_path: str) -> dict:
+    """Executa todos os passos para um arquivo (roda em um processo do pool)"""
+    result = probe_media(file_path)
+    result["poster_path"] = make_poster(file_path, result["duration"]) if result["width"] else None
+    modified = os.stat(file_path).st_mtime_ns
+    result["faststart"] = remux_faststart(file_path)
+    # O tamanho e o digest mudam com a reorganização; o catálogo acompanha o arquivo em disco
+    result["file_size"] = os.path.getsize(file_path)
+    if os.stat(file_path).st_mtime_ns != modified:
+        result["sha256"] = sha256_file(file_path)
+    return result
+
+
+class MediaProcessor:
+    """Fila de pós-processamento consumida por um pool de processos (um por processo, compartilhado)"""
+
+    def __init__(self, workers: int = MEDIA_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._queued = set()
+        self.summary = {"processed": 0, "failed": 0}
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = media_tools_available()
+            if not self._available:
+                print("⚠️  ffprobe/ffmpeg não encontrados: pós-processamento dos vídeos desativado")
+        return self._available
+
+    def _start(self):
+        if self._executor is None:
+            # spawn: os processos do pool não herdam conexões nem o loop de eventos do processo principal
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    def _reset_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._start()
+
+    def submit(self, records: Iterable[dict]):
+        """Agenda o processamento de vídeos recém-registrados (colunas channel_name, message_id, file_path)"""
+        if not self.available():
+            return
+        self._start()
+        for record in records:
+            key = (record["channel_name"], record["message_id"])
+            if key in self._queued or not record.get("file_path"):
+                continue
+            self._queued.add(key)
+            self._queue.put_nowait((key, record["file_path"]))
+
+    async def drain(self):
+        """Espera o processamento do que já está na fila"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        await self.drain()
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def process_pending(self, channel_name: Optional[str] = None, retry_failed: bool = False,
+                              limit: Optional[int] = None) -> dict:
+        """Processa os vídeos do catálogo ainda sem pós-processamento (retomada); retorna o resumo"""
+        if not self.available():
+            return dict(self.summary)
+
+        def load(db):
+            query = db.query(Video.channel_name, Video.message_id, Video.file_path).filter(
+                Video.is_downloaded.is_(True),
+                Video.media_processed_at.is_(None),
+            )
+            if not retry_failed:
+                query = query.filter(Video.media_error.is_(None))
+            if channel_name is not None:
+                query = query.filter(Video.channel_name == channel_name)
+            return query.order_by(Video.id).limit(limit).all()
+
+        pending = await run_db(load)
+        print(f"🎞️  {len(pending)} vídeos aguardando pós-processamento ({self.workers} processos)")
+        self.submit(dict(channel_name=row.channel_name, message_id=row.message_id, file_path=row.file_path)
+                    for row in pending)
+        await self.drain()
+        return dict(self.summary)
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, file_path = await self._queue.get()
+            try:
+                if not os.path.exists(file_path):
+                    raise FileNotFoundError(f"arquivo não encontrado: {file_path}")
+                result = await loop.run_in_executor(self._executor, process_file, file_path)
+                await self._save(key, result, None)
+                self.summary["processed"] += 1
+                print(f"🎞️  Vídeo {key[1]} processado: {result['width']}x{result['height']}, "
+                      f"{result['duration'] or 0:.0f}s, {result['video_codec']}")
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # Um processo do pool morreu: o pool é recriado para os próximos vídeos
+                    self._reset_executor()
+                self.summary["failed"] += 1
+                print(f"⚠️  Erro no pós-processamento do vídeo {key[1]}: {e}")
+                try:
+                    await self._save(key, None, str(e))
+                except Exception as save_error:
+                    print(f"⚠️  Erro ao registrar a falha do pós-processamento: {save_error}")
+            finally:
+                self._queued.discard(key)
+                self._queue.task_done()
+
+    @staticmethod
+    async def _save(key, result: Optional[dict], error: Optional[str]):
+        channel_name, message_id = key
+        values = dict(media_error=error)
+        if result is not None:
+            values.update(result, media_processed_at=datetime.utcnow())
+
+        def save(db):
+            db.execute(update(Video).where(
+                Video.channel_name == channel_name,
+                Video.message_id == message_id,
+            ).values(**values))
+            db.commit()
+
+        await run_db(save)
+
+
+# Processador compartilhado por todos os canais do processo
+media_processor = MediaProcessor()
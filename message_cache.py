@@ -0,0 +1,162 @@
+"""
+Cache local do histórico do canal (tabelas message_headers e message_cache_coverage)
+
+Guarda um cabeçalho compacto de cada mensagem (id, data, tipo de mídia, mime type,
+file_unique_id, tamanho e texto/legenda) e os intervalos de datas já buscados por completo.
+Consultas por data leem do banco e só pedem ao Telegram os trechos ainda não cobertos.
+
+Os cabeçalhos bastam para listar e parear vídeos com descrições; para baixar, as mensagens
+completas são buscadas de novo pelo ID (o file_id e a referência do arquivo expiram).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy.dialects.postgresql import insert
+
+from database import MessageCacheCoverage, MessageHeader, run_db
+
+# Tipos de mídia do Pyrogram guardados no cabeçalho (o primeiro presente na mensagem)
+MEDIA_KINDS = ("video", "document", "photo", "animation", "audio", "voice", "video_note", "sticker")
+
+# Linhas por INSERT ao gravar cabeçalhos
+HEADER_BATCH_SIZE = 1000
+
+# Resolução das datas do Telegram: intervalos a menos de 1 segundo de distância são contíguos
+_DATE_RESOLUTION = timedelta(seconds=1)
+
+# Mensagens mais recentes que isso ainda podem estar chegando: o trecho não é marcado como coberto
+RECENT_MARGIN = timedelta(minutes=1)
+
+DateRange = Tuple[datetime, datetime]
+
+
+class CachedMedia(NamedTuple):
+    """Mídia de uma mensagem em cache, com os atributos usados pela aplicação"""
+    file_unique_id: Optional[str]
+    file_size: Optional[int]
+    mime_type: Optional[str]
+    file_name: Optional[str] = None
+
+
+class CachedMessage:
+    """Mensagem reconstruída do cache, com os atributos de pyrogram.types.Message usados
+    na listagem e no pareamento (id, date, text, caption, video, document, photo)"""
+    from_cache = True
+
+    def __init__(self, header: MessageHeader):
+        self.id = header.message_id
+        self.date = header.date
+        self.media_kind = header.media_kind
+        media = CachedMedia(header.file_unique_id, header.file_size, header.mime_type) if header.media_kind else None
+        self.video = media if header.media_kind == "video" else None
+        self.document = media if header.media_kind == "document" else None
+        self.photo = media if header.media_kind == "photo" else None
+        # Em mensagens com mídia o texto é a legenda
+        self.text = None if header.media_kind else header.text
+        self.caption = header.text if header.media_kind else None
+
+    def __repr__(self):
+        return f"CachedMessage(id={self.id}, date={self.date}, media_kind={self.media_kind})"
+
+
+def header_values(channel_name: str, message: Any) -> dict:
+    """Cabeçalho compacto de uma mensagem do Pyrogram"""
+    media_kind, media = None, None
+    for kind in MEDIA_KINDS:
+        media = getattr(message, kind, None)
+        if media:
+            media_kind = kind
+            break
+    text = message.text or getattr(message, "caption", None)
+    return dict(
+        channel_name=channel_name,
+        message_id=message.id,
+        date=message.date,
+        media_kind=media_kind,
+        mime_type=getattr(media, "mime_type", None),
+        file_unique_id=getattr(media, "file_unique_id", None),
+        file_size=getattr(media, "file_size", None),
+        text=str(text) if text else None,
+    )
+
+
+def subtract_ranges(window: DateRange, covered: Iterable[DateRange]) -> List[DateRange]:
+    """Trechos da janela [início, fim] que não estão em nenhum dos intervalos cobertos"""
+    start, end = window
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end < cursor or covered_start > end:
+            continue
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - _DATE_RESOLUTION))
+        cursor = max(cursor, covered_end + _DATE_RESOLUTION)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class MessageCache:
+    """Cache de cabeçalhos de mensagens de um canal"""
+
+    def __init__(self, channel_name: Union[str, int]):
+        self.channel_name = str(channel_name)
+
+    async def missing_ranges(self, start: datetime, end: datetime) -> List[DateRange]:
+        """Trechos do período [start, end] que ainda precisam ser buscados no Telegram"""
+        def load(db):
+            return db.query(MessageCacheCoverage.start_date, MessageCacheCoverage.end_date).filter(
+                MessageCacheCoverage.channel_name == self.channel_name,
+                MessageCacheCoverage.end_date >= start - _DATE_RESOLUTION,
+                MessageCacheCoverage.start_date <= end + _DATE_RESOLUTION,
+            ).all()
+
+        covered = await run_db(load)
+        return subtract_ranges((start, end), [(row.start_date, row.end_date) for row in covered])
+
+    async def store(self, messages: List[Any], start: datetime, end: datetime):
+        """Grava os cabeçalhos das mensagens e marca [start, end] como coberto
+        (as mensagens devem ser todas as do histórico nesse período)"""
+        rows = [header_values(self.channel_name, message) for message in messages]
+        end = min(end, datetime.now() - RECENT_MARGIN)
+
+        def store(db):
+            for batch_start in range(0, len(rows), HEADER_BATCH_SIZE):
+                stmt = insert(MessageHeader)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[MessageHeader.channel_name, MessageHeader.message_id],
+                    set_={column: stmt.excluded[column]
+                          for column in ("date", "media_kind", "mime_type", "file_unique_id", "file_size", "text")},
+                )
+                db.execute(stmt, rows[batch_start:batch_start + HEADER_BATCH_SIZE])
+            if start <= end:
+                self._add_coverage(db, start, end)
+            db.commit()
+
+        await run_db(store)
+
+    def _add_coverage(self, db, start: datetime, end: datetime):
+        """Registra o intervalo coberto, fundindo-o com os intervalos vizinhos ou sobrepostos"""
+        overlapping = db.query(MessageCacheCoverage).filter(
+            MessageCacheCoverage.channel_name == self.channel_name,
+            MessageCacheCoverage.end_date >= start - _DATE_RESOLUTION,
+            MessageCacheCoverage.start_date <= end + _DATE_RESOLUTION,
+        ).all()
+        for interval in overlapping:
+            start = min(start, interval.start_date)
+            end = max(end, interval.end_date)
+            db.delete(interval)
+        db.add(MessageCacheCoverage(channel_name=self.channel_name, start_date=start, end_date=end))
+
+    async def load(self, start: datetime, end: datetime) -> List[CachedMessage]:
+        """Mensagens em cache no período, em ordem decrescente (como get_chat_history)"""
+        def load(db):
+            return db.query(MessageHeader).filter(
+                MessageHeader.channel_name == self.channel_name,
+                MessageHeader.date >= start,
+                MessageHeader.date <= end,
+            ).order_by(MessageHeader.message_id.desc()).all()
+
+        return [CachedMessage(header) for header in await run_db(load)]
@@ -0,0 +1,116 @@
+"""
+Espelhamento de vários canais em paralelo
+
+Cada canal é processado por um worker próprio, todos compartilhando o mesmo cliente do
+Telegram e um limite global de transferências simultâneas. Cada canal pode ocupar no máximo
+MAX_CONCURRENT_DOWNLOADS vagas, e as vagas globais são concedidas por ordem de chegada, então
+um canal muito grande não impede os demais de avançar.
+
+Os canais vêm de TELEGRAM_CHANNELS (separados por vírgula) ou do arquivo CHANNELS_FILE
+(padrão: channels.txt, um canal por linha, linhas com # são ignoradas).
+
+Uso:
+    docker-compose run --rm app python mirror_channels.py          # incremental
+    docker-compose run --rm app python mirror_channels.py --full   # todo o histórico
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import List, Union
+from dotenv import load_dotenv
+from media_processing import media_processor
+from telegram_client import TelegramClient, load_credentials, parse_channel_name
+from video_downloader import VideoDownloader
+from rate_limiter import rate_limiter
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# Transferências simultâneas somando todos os canais
+MAX_TOTAL_DOWNLOADS = int(os.getenv("MAX_TOTAL_DOWNLOADS", "8"))
+
+
+def load_channels() -> List[Union[int, str]]:
+    """Lê a lista de canais de TELEGRAM_CHANNELS ou do arquivo CHANNELS_FILE"""
+    channels_env = os.getenv("TELEGRAM_CHANNELS")
+    if channels_env:
+        values = channels_env.split(",")
+    else:
+        channels_file = os.getenv("CHANNELS_FILE", "channels.txt")
+        if not os.path.exists(channels_file):
+            return []
+        with open(channels_file, encoding="utf-8") as f:
+            values = [line.split("#", 1)[0] for line in f]
+
+    channels = []
+    for value in values:
+        if value.strip():
+            channel = parse_channel_name(value)
+            if channel not in channels:
+                channels.append(channel)
+    return channels
+
+
+async def mirror_channel(downloader: VideoDownloader, full: bool) -> dict:
+    """Worker de um canal: sincronização incremental (ou histórico completo)"""
+    if full:
+        return await downloader.download_all_videos()
+    return await downloader.sync_new_videos()
+
+
+async def mirror_channels(full: bool = False) -> int:
+    """Espelha todos os canais configurados em paralelo"""
+    channels = load_channels()
+    if not channels:
+        print("❌ Erro: configure TELEGRAM_CHANNELS ou o arquivo de canais (CHANNELS_FILE)!")
+        return 1
+
+    credentials = load_credentials()
+    if not credentials:
+        return 1
+
+    print("=" * 60)
+    print(f"🪞 Espelhando {len(channels)} canais (até {MAX_TOTAL_DOWNLOADS} downloads simultâneos no total)")
+    print("=" * 60)
+
+    client = TelegramClient(*credentials)
+    await client.connect()
+
+    try:
+        transfer_budget = asyncio.Semaphore(MAX_TOTAL_DOWNLOADS)
+        downloaders = [
+            VideoDownloader(client.client, channel, transfer_budget=transfer_budget)
+            for channel in channels
+        ]
+        results = await asyncio.gather(
+            *(mirror_channel(downloader, full) for downloader in downloaders),
+            return_exceptions=True
+        )
+        await media_processor.close()
+    finally:
+        await client.disconnect()
+
+    print("\n" + "=" * 60)
+    print("📊 Resumo por canal")
+    print("=" * 60)
+    failed_channels = 0
+    for channel, result in zip(channels, results):
+        if isinstance(result, BaseException):
+            failed_channels += 1
+            print(f"❌ {channel}: {result}")
+        elif result is None:
+            failed_channels += 1
+            print(f"❌ {channel}: não foi possível processar o canal")
+        else:
+            print(f"✅ {channel}: {result['downloaded']} baixados, {result['skipped']} pulados, {result['failed']} falharam, "
+                  f"{result['deduplicated']} reaproveitados ({result['bytes_saved'] / 1024 / 1024:.1f}MB economizados)")
+    print(f"🚦 Limites da API: {rate_limiter.describe()}")
+
+    return 1 if failed_channels else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Espelha vários canais do Telegram em paralelo")
+    parser.add_argument("--full", action="store_true", help="Percorrer todo o histórico em vez da sincronização incremental")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(mirror_channels(full=args.full)))
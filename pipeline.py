@@ -0,0 +1,169 @@
+"""
+Pipeline de estágios assíncronos ligados por filas limitadas
+
+Cada estágio consome a sua fila de entrada com um ou mais workers e entrega os resultados na
+fila do estágio seguinte. Como as filas têm tamanho máximo (PIPELINE_QUEUE_SIZE), um estágio
+lento segura os anteriores (backpressure) sem acumular itens em memória, enquanto estágios
+diferentes (varredura do histórico, transferências, gravação no banco) trabalham ao mesmo tempo.
+"""
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Itens aguardando em cada fila entre dois estágios
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+# Intervalo (em segundos) entre os relatórios de andamento (0 = apenas o relatório final)
+PIPELINE_REPORT_SECONDS = float(os.getenv("PIPELINE_REPORT_SECONDS", "30"))
+
+# Fim do fluxo, repassado de um estágio para o seguinte
+_DONE = object()
+
+Emit = Callable[[Any], Awaitable[None]]
+
+
+class Stage:
+    """Um estágio do pipeline: fila de entrada, workers e estatísticas"""
+
+    def __init__(self, name: str, handler: Optional[Callable[[Any, Emit], Awaitable[None]]] = None,
+                 workers: int = 1, finish: Optional[Callable[[Emit], Awaitable[None]]] = None,
+                 source: Optional[AsyncIterator[Any]] = None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.finish = finish
+        self.source = source
+        self.queue: Optional[asyncio.Queue] = None
+        # Itens processados, tempo esperando vaga na fila seguinte e maior fila de entrada observada
+        self.processed = 0
+        self.blocked = 0.0
+        self.max_depth = 0
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+
+class Pipeline:
+    """Estágios executados em paralelo; o primeiro é a fonte (um iterador assíncrono)
+
+    Os handlers recebem o item e uma função emit para entregar zero ou mais itens ao estágio
+    seguinte; finish (opcional) é chamado quando a entrada do estágio termina. Uma exceção em
+    qualquer estágio interrompe todos e é propagada por run().
+    """
+
+    def __init__(self, name: str, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 report_seconds: float = PIPELINE_REPORT_SECONDS):
+        self.name = name
+        self.queue_size = max(1, queue_size)
+        self.report_seconds = report_seconds
+        self.stages: List[Stage] = []
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def add_source(self, name: str, source: AsyncIterator[Any]):
+        if self.stages:
+            raise ValueError("A fonte deve ser o primeiro estágio do pipeline")
+        self.stages.append(Stage(name, source=source))
+
+    def add_stage(self, name: str, handler: Callable[[Any, Emit], Awaitable[None]], workers: int = 1,
+                  finish: Optional[Callable[[Emit], Awaitable[None]]] = None):
+        if not self.stages:
+            raise ValueError("O pipeline precisa de uma fonte antes dos demais estágios")
+        self.stages.append(Stage(name, handler, workers, finish))
+
+    async def run(self):
+        """Executa todos os estágios até a fonte se esgotar e as filas esvaziarem"""
+        for stage in self.stages[1:]:
+            stage.queue = asyncio.Queue(self.queue_size)
+        self.started = time.monotonic()
+        tasks = [asyncio.create_task(self._run_stage(stage, self._next(index)))
+                 for index, stage in enumerate(self.stages)]
+        reporter = asyncio.create_task(self._report_periodically()) if self.report_seconds > 0 else None
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if reporter is not None:
+                reporter.cancel()
+            self.finished = time.monotonic()
+
+    def _next(self, index: int) -> Optional[Stage]:
+        return self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+    def _emitter(self, stage: Stage, next_stage: Optional[Stage]) -> Emit:
+        async def emit(item: Any):
+            if next_stage is None:
+                return
+            queue = next_stage.queue
+            if queue.full():
+                started = time.monotonic()
+                await queue.put(item)
+                stage.blocked += time.monotonic() - started
+            else:
+                queue.put_nowait(item)
+            next_stage.max_depth = max(next_stage.max_depth, queue.qsize())
+        return emit
+
+    async def _run_stage(self, stage: Stage, next_stage: Optional[Stage]):
+        emit = self._emitter(stage, next_stage)
+        if stage.source is not None:
+            try:
+                async for item in stage.source:
+                    stage.processed += 1
+                    await emit(item)
+            finally:
+                if hasattr(stage.source, "aclose"):
+                    await stage.source.aclose()
+        else:
+            async def worker():
+                while True:
+                    item = await stage.queue.get()
+                    if item is _DONE:
+                        # Devolver a marca para os demais workers do estágio
+                        stage.queue.put_nowait(_DONE)
+                        return
+                    await stage.handler(item, emit)
+                    stage.processed += 1
+
+            await asyncio.gather(*(worker() for _ in range(stage.workers)))
+            stage.queue.get_nowait()
+            if stage.finish is not None:
+                await stage.finish(emit)
+        if next_stage is not None:
+            await next_stage.queue.put(_DONE)
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_seconds)
+            print(f"⏱️  Pipeline ({self.name}): {self.describe()}")
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Itens processados, vazão (itens/s), fila de entrada e tempo bloqueado de cada estágio"""
+        elapsed = max(self.elapsed(), 1e-9)
+        return {stage.name: {
+            "processed": stage.processed,
+            "throughput": stage.processed / elapsed,
+            "queue_depth": stage.depth(),
+            "max_queue_depth": stage.max_depth,
+            "blocked": stage.blocked,
+        } for stage in self.stages}
+
+    def describe(self) -> str:
+        parts = []
+        for stage, stats in zip(self.stages, self.snapshot().values()):
+            details = [f"{stats['throughput']:.1f}/s"]
+            if stage.queue is not None:
+                details.append(f"fila {stats['queue_depth']}/{self.queue_size} (máx. {stats['max_queue_depth']})")
+            if stats["blocked"] >= 0.05:
+                details.append(f"{stats['blocked']:.1f}s bloqueado")
+            parts.append(f"{stage.name} {stats['processed']} ({', '.join(details)})")
+        return " → ".join(parts)
@@ -0,0 +1,43 @@
+"""
+Pós-processamento dos vídeos já baixados (ffprobe/ffmpeg em um pool de processos)
+
+Processa os vídeos do catálogo que ainda não passaram pelo pós-processamento: duração,
+resolução e codecs na tabela videos, imagem de capa e faststart nos MP4. Pode ser
+interrompido e executado de novo: os vídeos já processados são pulados.
+
+Para processar automaticamente após cada download, defina MEDIA_PROCESSING=true.
+
+Uso:
+    docker-compose run --rm app python process_media.py [--channel X] [--limit N]
+    docker-compose run --rm app python process_media.py --retry-failed   # inclui os que falharam
+"""
+import argparse
+import asyncio
+import sys
+from dotenv import load_dotenv
+from database import init_db
+from media_processing import media_processor
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+async def process_media(channel: str = None, retry_failed: bool = False, limit: int = None) -> int:
+    init_db()
+    if not media_processor.available():
+        return 1
+    try:
+        summary = await media_processor.process_pending(channel, retry_failed=retry_failed, limit=limit)
+    finally:
+        await media_processor.close()
+
+    print(f"\n🎞️  Pós-processamento: {summary['processed']} vídeos processados, {summary['failed']} falharam")
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pós-processamento dos vídeos baixados")
+    parser.add_argument("--channel", help="Canal (ID ou username) como configurado no download")
+    parser.add_argument("--retry-failed", action="store_true", help="Tentar de novo os vídeos que falharam")
+    parser.add_argument("--limit", type=int, help="Máximo de vídeos a processar")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(process_media(args.channel, args.retry_failed, args.limit)))
@@ -0,0 +1,320 @@
+"""
+Limitação das chamadas à API do Telegram, com tratamento de FloodWait
+
+Cada tipo de chamada (chat, histórico, download) tem um token bucket (chamadas por segundo) e
+um limite de chamadas simultâneas ajustado no estilo AIMD: cai pela metade a cada FloodWait e
+volta a subir de um em um enquanto as chamadas passam sem bloqueio. Um FloodWait pausa todas as
+chamadas daquele tipo pelo tempo pedido pelo Telegram e a chamada é repetida.
+
+O Pyrogram já espera sozinho os FloodWait curtos (sleep_threshold do Client); os demais
+chegam aqui como exceção.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from pyrogram.errors import FloodWait
+
+# Tipos de chamada: (descrição, chamadas por segundo, máximo de chamadas simultâneas)
+CALL_TYPES = {
+    "chat": ("chat", float(os.getenv("RATE_LIMIT_CHAT", "5")), int(os.getenv("MAX_CONCURRENCY_CHAT", "2"))),
+    "history": ("histórico", float(os.getenv("RATE_LIMIT_HISTORY", "20")), int(os.getenv("MAX_CONCURRENCY_HISTORY", "8"))),
+    # Para downloads, cada bloco de 1 MiB conta como uma chamada
+    "download": ("download", float(os.getenv("RATE_LIMIT_DOWNLOAD", "100")), int(os.getenv("MAX_CONCURRENCY_DOWNLOAD", "16"))),
+}
+
+# Quantas vezes a mesma chamada é repetida após FloodWait antes de desistir
+FLOOD_WAIT_MAX_RETRIES = int(os.getenv("FLOOD_WAIT_MAX_RETRIES", "5"))
+
+# Mensagens por página de get_chat_history (uma chamada à API por página)
+HISTORY_PAGE_SIZE = 100
+# Diálogos devolvidos por get_dialogs em cada requisição
+DIALOGS_PAGE_SIZE = 100
+
+
+class TokenBucket:
+    """Token bucket assíncrono: até rate chamadas por segundo, com rajadas de até capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float):
+        """Suspende a emissão de tokens (FloodWait)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self) -> float:
+        """Espera um token; retorna o tempo esperado em segundos"""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                delay = self.paused_until - now
+            else:
+                refill_from = max(self.updated, self.paused_until)
+                self.tokens = min(self.capacity, self.tokens + (now - refill_from) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class AdaptiveConcurrency:
+    """Limite de chamadas simultâneas com aumento aditivo e redução multiplicativa (AIMD)"""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_use = 0
+        self._successes = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # O limitador é global ao processo; a condição pertence ao loop de eventos em execução
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_use = 0
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_use -= 1
+            condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self.limit < self.max_limit and self._successes >= self.limit:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self):
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+
+
+class CallLimiter:
+    """Token bucket, concorrência adaptativa e estatísticas de um tipo de chamada"""
+
+    def __init__(self, label: str, rate: float, max_concurrency: int):
+        self.label = label
+        self.bucket = TokenBucket(rate)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.calls = 0
+        self.flood_waits = 0
+        self.waited = 0.0
+
+    async def token(self):
+        """Espera a vez de fazer uma chamada (sem ocupar vaga de concorrência)"""
+        self.waited += await self.bucket.acquire()
+        self.calls += 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ocupa uma vaga de concorrência durante uma chamada (ou transferência)"""
+        started = time.monotonic()
+        await self.concurrency.acquire()
+        self.waited += time.monotonic() - started
+        try:
+            yield
+        finally:
+            await self.concurrency.release()
+
+    async def throttled(self, error: FloodWait):
+        """Registra um FloodWait: reduz a concorrência, pausa o tipo de chamada e espera"""
+        seconds = float(error.value or 1)
+        self.flood_waits += 1
+        self.waited += seconds
+        self.concurrency.on_throttle()
+        self.bucket.pause(seconds)
+        print(f"🚦 FloodWait ({self.label}): aguardando {seconds:.0f}s; "
+              f"limite reduzido para {self.concurrency.limit} chamadas simultâneas")
+        await asyncio.sleep(seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.concurrency.limit,
+            "max_limit": self.concurrency.max_limit,
+            "rate": self.bucket.rate,
+            "calls": self.calls,
+            "flood_waits": self.flood_waits,
+            "waited": self.waited,
+        }
+
+
+class RateLimiter:
+    """Conjunto de limitadores por tipo de chamada (um por processo, compartilhado entre canais)"""
+
+    def __init__(self):
+        self.limiters = {kind: CallLimiter(*settings) for kind, settings in CALL_TYPES.items()}
+
+    def __getitem__(self, kind: str) -> CallLimiter:
+        return self.limiters[kind]
+
+    async def call(self, kind: str, operation: Callable[..., Any], *args, **kwargs) -> Any:
+        """Executa uma chamada respeitando o limite do tipo, repetindo-a após FloodWait"""
+        limiter = self.limiters[kind]
+        for attempt in range(FLOOD_WAIT_MAX_RETRIES + 1):
+            async with limiter.slot():
+                await limiter.token()
+                try:
+                    result = await operation(*args, **kwargs)
+                except FloodWait as e:
+                    if attempt == FLOOD_WAIT_MAX_RETRIES:
+                        raise
+                    error = e
+                else:
+                    limiter.concurrency.on_success()
+                    return result
+            # A espera acontece fora da vaga, para não bloquear as demais chamadas além do necessário
+            await limiter.throttled(error)
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {kind: limiter.snapshot() for kind, limiter in self.limiters.items()}
+
+    def describe(self, since: Optional[Dict[str, dict]] = None) -> str:
+        """Resumo dos limites atuais e da espera acumulada (desde o snapshot since, se informado)"""
+        parts = []
+        flood_waits = 0
+        waited = 0.0
+        for kind, current in self.snapshot().items():
+            before = since.get(kind) if since else None
+            flood_waits += current["flood_waits"] - (before["flood_waits"] if before else 0)
+            waited += current["waited"] - (before["waited"] if before else 0)
+            parts.append(f"{self.limiters[kind].label} {current['limit']}/{current['max_limit']} simultâneas "
+                         f"({current['rate']:.0f}/s)")
+        return f"{', '.join(parts)} | {flood_waits} FloodWait, {waited:.1f}s de espera"
+
+
+# Limitador compartilhado por todos os clientes do processo
+rate_limiter = RateLimiter()
+
+
+class RateLimitedClient:
+    """Envolve um Client do Pyrogram passando as chamadas à API pelo limitador
+
+    Chamadas não tratadas aqui são repassadas diretamente ao cliente original.
+    """
+
+    def __init__(self, client, limiter: RateLimiter = rate_limiter):
+        self.client = client
+        self.rate_limiter = limiter
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    async def get_chat(self, chat_id, *args, **kwargs):
+        return await self.rate_limiter.call("chat", self.client.get_chat, chat_id, *args, **kwargs)
+
+    async def get_messages(self, chat_id, message_ids=None, *args, **kwargs):
+        return await self.rate_limiter.call("history", self.client.get_messages, chat_id, message_ids, *args, **kwargs)
+
+    async def download_media(self, message, *args, **kwargs):
+        return await self.rate_limiter.call("download", self.client.download_media, message, *args, **kwargs)
+
+    async def get_dialogs(self, limit: int = 0) -> AsyncIterator[Any]:
+        """get_dialogs com um token por página; após FloodWait recomeça a listagem e pula os diálogos já entregues"""
+        limiter = self.rate_limiter["chat"]
+        returned = 0
+        for attempt in range(FLOOD_WAIT_MAX_RETRIES + 1):
+            try:
+                await limiter.token()
+                seen = 0
+                async for dialog in self.client.get_dialogs(limit=limit):
+                    seen += 1
+                    if seen % DIALOGS_PAGE_SIZE == 0:
+                        limiter.concurrency.on_success()
+                        await limiter.token()
+                    if seen <= returned:
+                        continue
+                    yield dialog
+                    returned += 1
+                return
+            except FloodWait as e:
+                if attempt == FLOOD_WAIT_MAX_RETRIES:
+                    raise
+                await limiter.throttled(e)
+
+    async def get_chat_history(self, chat_id, limit: int = 0, offset: int = 0, offset_id: int = 0,
+                               offset_date=None) -> AsyncIterator[Any]:
+        """get_chat_history com um token por página; após FloodWait continua da última mensagem entregue"""
+        limiter = self.rate_limiter["history"]
+        returned = 0
+        last_id = None
+        for attempt in range(FLOOD_WAIT_MAX_RETRIES + 1):
+            if last_id is None:
+                kwargs = dict(offset=offset, offset_id=offset_id)
+                if offset_date is not None:
+                    kwargs["offset_date"] = offset_date
+            else:
+                kwargs = dict(offset_id=last_id)
+            if limit:
+                kwargs["limit"] = limit - returned
+            try:
+                await limiter.token()
+                served = 0
+                async for message in self.client.get_chat_history(chat_id, **kwargs):
+                    yield message
+                    returned += 1
+                    last_id = message.id
+                    served += 1
+                    if served % HISTORY_PAGE_SIZE == 0:
+                        limiter.concurrency.on_success()
+                        await limiter.token()
+                return
+            except FloodWait as e:
+                if attempt == FLOOD_WAIT_MAX_RETRIES:
+                    raise
+                await limiter.throttled(e)
+
+    async def stream_media(self, message, limit: int = 0, offset: int = 0) -> AsyncIterator[bytes]:
+        """stream_media com um token antes de cada bloco, ocupando uma vaga de download durante a
+        transferência; após FloodWait continua a partir do último bloco entregue
+
+        Com limit, nenhum token é gasto depois do último bloco; sem limit (até o fim do arquivo), o
+        fim só é conhecido na busca seguinte ao último bloco, que também consome um token.
+        """
+        limiter = self.rate_limiter["download"]
+        served = 0
+        for attempt in range(FLOOD_WAIT_MAX_RETRIES + 1):
+            async with limiter.slot():
+                remaining = limit - served if limit else 0
+                chunks = self.client.stream_media(message, limit=remaining, offset=offset + served)
+                try:
+                    while not limit or served < limit:
+                        await limiter.token()
+                        try:
+                            chunk = await chunks.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        yield chunk
+                        served += 1
+                        limiter.concurrency.on_success()
+                    return
+                except FloodWait as e:
+                    if attempt == FLOOD_WAIT_MAX_RETRIES:
+                        raise
+                    error = e
+                finally:
+                    await chunks.aclose()
+            # Como em RateLimiter.call, a espera acontece fora da vaga: com o limite reduzido pelo
+            # FloodWait, as transferências em espera não mantêm in_use acima do novo limite
+            await limiter.throttled(error)
@@ -0,0 +1,51 @@
+"""
+Busca de vídeos do catálogo por título e descrição
+
+Uso:
+    docker-compose run --rm app python search_videos.py "receita de bolo" [--channel X] [--limit N]
+    docker-compose run --rm app python search_videos.py '"frase exata" -palavra' --downloaded
+
+Os termos usam a sintaxe de busca da web: todas as palavras são obrigatórias, "aspas" buscam
+uma frase, or separa alternativas e -palavra exclui resultados.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from dotenv import load_dotenv
+from database import init_db
+from video_search import SEARCH_LIMIT, search_videos
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+async def search(terms: str, channel: str = None, limit: int = SEARCH_LIMIT, downloaded_only: bool = False) -> int:
+    init_db()
+    started = time.monotonic()
+    results = await search_videos(terms, channel, limit=limit, downloaded_only=downloaded_only)
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    if not results:
+        print(f"ℹ️  Nenhum vídeo encontrado para: {terms}")
+        return 1
+
+    print(f"🔍 {len(results)} vídeos encontrados para: {terms} ({elapsed_ms:.0f} ms)\n")
+    for position, result in enumerate(results, 1):
+        title = result.file_name or f"Vídeo {result.message_id}"
+        date = result.message_date.strftime("%d/%m/%Y") if result.message_date else "sem data"
+        status = "✅" if result.is_downloaded else "⏳"
+        print(f"{position:>3}. {status} {title}  [{result.rank:.2f}]")
+        print(f"     {result.channel_name} · mensagem {result.message_id} · {date}")
+        if result.file_path and result.is_downloaded:
+            print(f"     {result.file_path}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca de vídeos por título e descrição")
+    parser.add_argument("terms", help="Termos da busca")
+    parser.add_argument("--channel", help="Canal (ID ou username) como configurado no download")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="Máximo de resultados")
+    parser.add_argument("--downloaded", action="store_true", help="Apenas vídeos já baixados")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(search(args.terms, args.channel, args.limit, args.downloaded)))
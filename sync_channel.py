@@ -0,0 +1,51 @@
+"""
+Sincronização incremental não interativa (para uso em cron)
+
+Baixa apenas os vídeos postados após a última execução, usando a marca d'água
+salva por canal na tabela channel_sync_state.
+
+Uso:
+    docker-compose run --rm app python sync_channel.py
+    docker-compose run --rm app python sync_channel.py --enqueue-only   # só enfileira; os workers baixam
+"""
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from media_processing import media_processor
+from telegram_client import TelegramClient, load_credentials, parse_channel_name
+from video_downloader import VideoDownloader
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+async def sync_channel(enqueue_only: bool = False) -> int:
+    """Executa a sincronização incremental do canal configurado"""
+    channel_name = os.getenv("TELEGRAM_CHANNEL_NAME")
+    if not channel_name:
+        print("❌ Erro: TELEGRAM_CHANNEL_NAME deve estar configurado no arquivo .env!")
+        return 1
+    
+    credentials = load_credentials()
+    if not credentials:
+        return 1
+    
+    client = TelegramClient(*credentials)
+    await client.connect()
+    
+    try:
+        downloader = VideoDownloader(client.client, parse_channel_name(channel_name), enqueue_only=enqueue_only)
+        await downloader.sync_new_videos()
+        await media_processor.close()
+    finally:
+        await client.disconnect()
+    
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincronização incremental do canal configurado")
+    parser.add_argument("--enqueue-only", action="store_true",
+                        help="Apenas colocar os novos vídeos na fila de downloads (processada por worker.py)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(sync_channel(enqueue_only=args.enqueue_only)))
@@ -1,7 +1,32 @@
 from pyrogram import Client
 from pyrogram.types import Message
 import os
-from typing import Optional
+from typing import Optional, Tuple, Union
+
+
+def load_credentials() -> Optional[Tuple[int, str]]:
+    """Lê TELEGRAM_API_ID e TELEGRAM_API_HASH do ambiente (None se inválidos)"""
+    api_id = os.getenv("TELEGRAM_API_ID")
+    api_hash = os.getenv("TELEGRAM_API_HASH")
+    
+    if not api_id or not api_hash:
+        print("❌ Erro: TELEGRAM_API_ID e TELEGRAM_API_HASH devem estar configurados!")
+        return None
+    
+    try:
+        return int(api_id), api_hash
+    except ValueError:
+        print("❌ Erro: TELEGRAM_API_ID deve ser um número!")
+        return None
+
+
+def parse_channel_name(value: str) -> Union[int, str]:
+    """Converte o canal para int se for um ID numérico, caso contrário mantém o username"""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
 
 class TelegramClient:
     def __init__(self, api_id: int, api_hash: str, session_name: str = "telegram_session"):
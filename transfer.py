@@ -0,0 +1,196 @@
+"""
+Transferência de arquivos do Telegram em blocos, com retomada de downloads interrompidos
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional, Set
+
+from pyrogram import Client
+from pyrogram.types import Message
+
+# stream_media do Pyrogram trabalha com blocos de 1 MiB (offset e limit são em blocos)
+CHUNK_SIZE = 1024 * 1024
+
+# Arquivos a partir deste tamanho são baixados em partes paralelas
+PARALLEL_MIN_SIZE = int(os.getenv("PARALLEL_DOWNLOAD_MIN_MB", "64")) * 1024 * 1024
+# Tamanho de cada parte (arredondado para um múltiplo de CHUNK_SIZE)
+PARALLEL_PART_SIZE = max(1, int(os.getenv("PARALLEL_PART_MB", "16"))) * CHUNK_SIZE
+# Partes transferidas ao mesmo tempo para um único arquivo
+PARALLEL_CONNECTIONS = int(os.getenv("PARALLEL_CONNECTIONS", "4"))
+# Threads que gravam os blocos em disco (escritas e fsync ficam fora do loop de eventos)
+TRANSFER_IO_WORKERS = int(os.getenv("TRANSFER_IO_WORKERS", "4"))
+
+_io_executor = ThreadPoolExecutor(max_workers=max(1, TRANSFER_IO_WORKERS), thread_name_prefix="disk")
+
+# Fonte de blocos: recebe (bloco inicial, quantidade de blocos; 0 = até o fim) e produz os bytes
+ChunkSource = Callable[[int, int], AsyncIterator[bytes]]
+ProgressCallback = Callable[[int, int], None]
+
+
+def pyrogram_chunk_source(client: Client, message: Message) -> ChunkSource:
+    """Fonte de blocos que lê a mídia da mensagem via stream_media"""
+    def source(offset: int, limit: int) -> AsyncIterator[bytes]:
+        return client.stream_media(message, limit=limit, offset=offset)
+    return source
+
+
+def part_file_path(file_path: str, message_id: int) -> str:
+    """Arquivo parcial usado enquanto o download não termina"""
+    return f"{file_path}.{message_id}.part"
+
+
+def parallel_part_path(part_path: str) -> str:
+    """Arquivo parcial do download em partes paralelas (pré-alocado com o tamanho final, por isso
+    não pode ser confundido com o arquivo parcial do fluxo único)"""
+    return f"{part_path}.parallel"
+
+
+async def _on_disk(operation: Callable, *args):
+    """Executa uma operação de disco no pool de I/O: um disco lento não trava as demais corrotinas
+    (heartbeats, varredura do histórico, outros downloads)"""
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, operation, *args)
+
+
+def _sync_file(file) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def committed_bytes(part_path: str) -> int:
+    """Bytes já gravados no arquivo parcial, descartando um bloco final incompleto"""
+    if not os.path.exists(part_path):
+        return 0
+    size = os.path.getsize(part_path)
+    return size - size % CHUNK_SIZE
+
+
+async def download_resumable(source: ChunkSource, file_path: str, part_path: str, total_size: int,
+                             progress: Optional[ProgressCallback] = None) -> str:
+    """Baixa para part_path a partir do último bloco completo e renomeia para file_path ao terminar
+
+    Se a transferência falhar, o arquivo parcial é mantido para que a próxima tentativa
+    continue de onde parou. Lança IOError se o tamanho final não corresponder a total_size.
+    """
+    if os.path.exists(parts_state_path(part_path)):
+        # Arquivo pré-alocado por um download paralelo (versões anteriores usavam o mesmo caminho):
+        # o tamanho não indica o que já foi baixado, então ele é descartado
+        _remove_partial(part_path)
+    committed = committed_bytes(part_path)
+    if committed:
+        print(f"  ⏯️  Retomando download a partir de {committed // 1024 // 1024}MB")
+
+    if not total_size or committed < total_size:
+        mode = "r+b" if os.path.exists(part_path) else "wb"
+        with open(part_path, mode) as part_file:
+            part_file.truncate(committed)
+            part_file.seek(committed)
+            # Com o tamanho conhecido, a fonte sabe quantos blocos faltam e não busca além do último
+            remaining = (total_size - committed + CHUNK_SIZE - 1) // CHUNK_SIZE if total_size else 0
+            async for chunk in source(committed // CHUNK_SIZE, remaining):
+                await _on_disk(part_file.write, chunk)
+                committed += len(chunk)
+                if progress:
+                    progress(committed, total_size)
+            await _on_disk(_sync_file, part_file)
+
+    final_size = os.path.getsize(part_path)
+    if total_size and final_size != total_size:
+        raise IOError(f"download incompleto: {final_size} de {total_size} bytes")
+
+    os.replace(part_path, file_path)
+    return file_path
+
+
+def parts_state_path(part_path: str) -> str:
+    """Arquivo com os índices das partes já concluídas de um download paralelo"""
+    return f"{part_path}.parts"
+
+
+def _load_completed_parts(part_path: str, total_size: int) -> Set[int]:
+    state_path = parts_state_path(part_path)
+    if not os.path.exists(state_path) or not os.path.exists(part_path) or os.path.getsize(part_path) != total_size:
+        return set()
+    with open(state_path) as state_file:
+        return {int(line) for line in state_file if line.strip()}
+
+
+async def download_parallel(source: ChunkSource, file_path: str, part_path: str, total_size: int,
+                            connections: int = PARALLEL_CONNECTIONS, part_size: int = PARALLEL_PART_SIZE,
+                            progress: Optional[ProgressCallback] = None) -> str:
+    """Baixa o arquivo em partes de part_size bytes buscadas simultaneamente (até connections)
+
+    As partes são escritas diretamente na posição final de um arquivo pré-alocado e cada parte
+    concluída é registrada em <part>.parts, então uma nova tentativa baixa apenas as que faltam.
+    """
+    part_size -= part_size % CHUNK_SIZE
+    part_size = max(part_size, CHUNK_SIZE)
+    part_count = (total_size + part_size - 1) // part_size
+
+    completed = _load_completed_parts(part_path, total_size)
+    if not completed:
+        # Pré-alocar o arquivo com o tamanho final e começar um novo registro de partes
+        with open(part_path, "wb") as part_file:
+            part_file.truncate(total_size)
+        open(parts_state_path(part_path), "w").close()
+    else:
+        print(f"  ⏯️  Retomando download: {len(completed)} de {part_count} partes já concluídas")
+
+    transferred = [sum(min(part_size, total_size - index * part_size) for index in completed)]
+    semaphore = asyncio.Semaphore(max(1, connections))
+    fd = os.open(part_path, os.O_WRONLY)
+
+    def commit_part(index: int):
+        # A parte só é registrada depois de os dados estarem no disco
+        os.fsync(fd)
+        with open(parts_state_path(part_path), "a") as state_file:
+            state_file.write(f"{index}\n")
+
+    async def fetch_part(index: int):
+        start = index * part_size
+        expected = min(part_size, total_size - start)
+        async with semaphore:
+            position = start
+            async for chunk in source(start // CHUNK_SIZE, part_size // CHUNK_SIZE):
+                await _on_disk(os.pwrite, fd, chunk, position)
+                position += len(chunk)
+                transferred[0] += len(chunk)
+                if progress:
+                    progress(transferred[0], total_size)
+        if position - start != expected:
+            transferred[0] -= position - start
+            raise IOError(f"parte {index} incompleta: {position - start} de {expected} bytes")
+        await _on_disk(commit_part, index)
+
+    try:
+        pending = [index for index in range(part_count) if index not in completed]
+        # Uma parte com falha não interrompe as outras; as concluídas ficam registradas
+        results = await asyncio.gather(*(fetch_part(index) for index in pending), return_exceptions=True)
+    finally:
+        os.close(fd)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise IOError(f"{len(errors)} de {len(pending)} partes falharam: {errors[0]}")
+
+    os.replace(part_path, file_path)
+    os.remove(parts_state_path(part_path))
+    return file_path
+
+
+async def download_media(source: ChunkSource, file_path: str, part_path: str, total_size: int,
+                         progress: Optional[ProgressCallback] = None) -> str:
+    """Escolhe o modo de transferência: partes paralelas para arquivos grandes, fluxo único para os demais
+    Cada modo usa o seu próprio arquivo parcial; o que sobrou de uma tentativa no outro modo é removido"""
+    parallel_path = parallel_part_path(part_path)
+    if PARALLEL_CONNECTIONS > 1 and total_size >= PARALLEL_MIN_SIZE:
+        _remove_partial(part_path)
+        return await download_parallel(source, file_path, parallel_path, total_size, progress=progress)
+    _remove_partial(parallel_path)
+    return await download_resumable(source, file_path, part_path, total_size, progress=progress)
+
+
+def _remove_partial(part_path: str):
+    for path in (part_path, parts_state_path(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
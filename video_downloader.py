@@ -1,18 +1,97 @@
 import asyncio
 import re
+from contextlib import aclosing
 from datetime import datetime, timedelta, time
-from typing import Optional, List, Union, Tuple
+from typing import Optional, List, Set, Union, Tuple, Dict, AsyncIterator, NamedTuple
 from pyrogram.types import Message
 from pyrogram import Client
-from database import SessionLocal, Video, init_db
+from pyrogram.errors import FloodWait
+from database import Video, ChannelSyncState, BackfillCheckpoint, DownloadJob, init_db, run_db
+from catalog_writer import CatalogWriter
+from chat_cache import get_cached_chat, restore_peer, store_chat
+from message_cache import MessageCache
+from date_index import DateIndex
+from rate_limiter import RateLimitedClient
+from job_queue import DownloadJobQueue
+from media_processing import MEDIA_PROCESSING, media_processor
+from integrity import check_size, verify_download
+from pipeline import Emit, Pipeline
+from history_scanner import (GET_MESSAGES_LIMIT, HISTORY_SCAN_CONCURRENCY, get_newest_message_id,
+                             scan_history_by_ids)
+from transfer import download_media, part_file_path, pyrogram_chunk_source
+from caption_pairing import (PairedVideo, StreamingCaptionPairer, build_message_index, find_description,
+                             is_video_message, pair_captions, OLDER_WINDOW, NEWER_WINDOW)
 import os
 
+# Número padrão de downloads simultâneos nos modos em lote
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "4"))
+
+# Arquivos sendo baixados e já baixados neste processo (file_unique_id -> caminho final),
+# compartilhados entre canais para que o mesmo conteúdo não seja transferido duas vezes
+_files_in_transfer: Dict[str, asyncio.Future] = {}
+_files_completed: Dict[str, str] = {}
+# Tamanho e SHA-256 dos arquivos baixados e conferidos neste processo (caminho -> (bytes, digest)),
+# usados na deduplicação enquanto o registro ainda não foi gravado no catálogo
+_file_states: Dict[str, Tuple[int, str]] = {}
+
+# A cada quantas mensagens lidas o cursor do download completo é salvo no banco
+BACKFILL_CHECKPOINT_INTERVAL = int(os.getenv("BACKFILL_CHECKPOINT_INTERVAL", "500"))
+
+# Vídeos gravados de uma vez na fila quando a varredura apenas enfileira (enqueue_only)
+JOB_ENQUEUE_BATCH = 100
+
+
+class TransferResult(NamedTuple):
+    """Resultado do estágio de transferência, entregue ao estágio do catálogo"""
+    paired: PairedVideo
+    status: str
+    record: Optional[dict]
+    error: Optional[str]
+    # False se o job estava com outro worker (nada a registrar na fila)
+    acquired: bool
+
+
 class VideoDownloader:
-    def __init__(self, client: Client, channel_name: Union[str, int], videos_path: str = "/app/videos"):
-        self.client = client
+    def __init__(self, client: Client, channel_name: Union[str, int], videos_path: str = "/app/videos",
+                 max_concurrent_downloads: Optional[int] = None, transfer_budget: Optional[asyncio.Semaphore] = None,
+                 enqueue_only: bool = False, process_media: Optional[bool] = None):
+        # Todas as chamadas à API passam pelo limitador compartilhado (token bucket + FloodWait)
+        self.client = client if isinstance(client, RateLimitedClient) else RateLimitedClient(client)
         self.channel_name = channel_name
         self.videos_path = videos_path
-        self.db = SessionLocal()
+        self.max_concurrent_downloads = max(1, max_concurrent_downloads or DEFAULT_MAX_CONCURRENT_DOWNLOADS)
+        # Limite global de transferências compartilhado entre canais (espelhamento de vários canais)
+        self.transfer_budget = transfer_budget
+        
+        # Índice message_id -> posição da última lista de mensagens consultada
+        self._indexed_messages: Optional[List[Message]] = None
+        self._indexed_count = 0
+        self._message_index: Dict[int, int] = {}
+        
+        # Pós-processamento (ffprobe/ffmpeg) dos vídeos assim que são registrados no catálogo
+        self.process_media = MEDIA_PROCESSING if process_media is None else process_media
+        
+        # Registros de vídeos concluídos são gravados em lote
+        self.catalog = CatalogWriter(on_write=self._catalog_written)
+        
+        # Cabeçalhos de mensagens já buscadas (consultas por data) e ID do chat resolvido
+        self.message_cache = MessageCache(channel_name)
+        # Índice esparso data -> ID de mensagem, alimentado por todas as varreduras do histórico
+        self.date_index = DateIndex(channel_name)
+        self._chat_id: Optional[int] = None
+        
+        # Fila persistente de downloads (novas tentativas sem percorrer o histórico de novo)
+        self.jobs = DownloadJobQueue(channel_name)
+        # Varreduras apenas colocam os vídeos na fila; os downloads ficam com os workers (worker.py)
+        self.enqueue_only = enqueue_only
+        # Último erro de download por mensagem, registrado no job
+        self._last_errors: Dict[int, str] = {}
+        # Jobs de downloads concluídos aguardando a gravação do registro no catálogo
+        self._awaiting_catalog: Set[int] = set()
+        
+        # Vídeos já baixados deste canal (message_id -> caminho), carregados em uma única consulta
+        self._downloaded_index: Optional[Dict[int, str]] = None
+        self._known_files: Optional[Dict[str, str]] = None
         
         # Criar diretório se não existir
         os.makedirs(videos_path, exist_ok=True)
@@ -59,72 +138,27 @@ class VideoDownloader:
         text = " ".join(description.split())
         return text[:100]
 
-    async def get_description_from_previous_message(self, all_messages: List[Message], video_message: Message) -> Optional[Tuple[str, Message]]:
+    def _get_message_index(self, all_messages: List[Message]) -> Dict[int, int]:
+        """Retorna o índice message_id -> posição da lista, reaproveitando o último índice construído"""
+        if self._indexed_messages is not all_messages or self._indexed_count != len(all_messages):
+            self._message_index = build_message_index(all_messages)
+            self._indexed_messages = all_messages
+            self._indexed_count = len(all_messages)
+        return self._message_index
+
+    async def get_description_from_previous_message(self, all_messages: List[Message], video_message: Message,
+                                                    message_index: Optional[Dict[int, int]] = None) -> Optional[Tuple[str, Message]]:
         """Busca descrição na mensagem anterior ao vídeo (considerando todas as mensagens)
         Retorna uma tupla (descrição, mensagem) ou None se não encontrar"""
-        # Encontrar o índice do vídeo na lista completa de mensagens
-        video_index = None
-        for idx, msg in enumerate(all_messages):
-            if msg.id == video_message.id:
-                video_index = idx
-                break
+        # Encontrar o índice do vídeo na lista completa de mensagens (O(1) com o índice por ID)
+        if message_index is None:
+            message_index = self._get_message_index(all_messages)
+        video_index = message_index.get(video_message.id)
         
         if video_index is None:
             return None
         
-        # As mensagens vêm em ordem decrescente (mais recentes primeiro)
-        # Então video_index + 1 é a mensagem mais recente (anterior na ordem cronológica)
-        # Mas na verdade, precisamos procurar mensagens que vieram ANTES do vídeo cronologicamente
-        # Como a lista está em ordem decrescente, mensagens com índice MENOR são mais recentes
-        # Então precisamos procurar mensagens com índice MAIOR (mais antigas na lista = mais antigas cronologicamente)
-        
-        # Buscar mensagens posteriores na lista (que são mais antigas cronologicamente)
-        # Mas também verificar mensagens anteriores na lista (mais recentes) caso o título esteja depois
-        for i in range(1, min(11, len(all_messages) - video_index)):
-            # Procurar mensagens mais antigas (índice maior)
-            next_index = video_index + i
-            if next_index >= len(all_messages):
-                break
-                
-            next_message = all_messages[next_index]
-            
-            # Verificar se é uma mensagem com texto (pode ter foto/imagem junto, mas precisa ter texto)
-            # O texto pode estar em message.text ou message.caption (legenda de foto)
-            message_text = next_message.text or (next_message.caption if hasattr(next_message, 'caption') else None)
-            has_text = message_text and message_text.strip()
-            
-            # Não pode ser vídeo ou documento de vídeo
-            is_not_video = (
-                not next_message.video and 
-                not (next_message.document and next_message.document.mime_type and "video" in next_message.document.mime_type)
-            )
-            
-            if has_text and is_not_video:
-                return (message_text, next_message)
-        
-        # Se não encontrou nas mensagens mais antigas, tentar nas mais recentes (índice menor)
-        for i in range(1, min(6, video_index + 1)):
-            prev_index = video_index - i
-            if prev_index < 0:
-                break
-                
-            prev_message = all_messages[prev_index]
-            
-            # Verificar se é uma mensagem com texto (pode ter foto/imagem junto, mas precisa ter texto)
-            # O texto pode estar em message.text ou message.caption (legenda de foto)
-            message_text = prev_message.text or (prev_message.caption if hasattr(prev_message, 'caption') else None)
-            has_text = message_text and message_text.strip()
-            
-            # Não pode ser vídeo ou documento de vídeo
-            is_not_video = (
-                not prev_message.video and 
-                not (prev_message.document and prev_message.document.mime_type and "video" in prev_message.document.mime_type)
-            )
-            
-            if has_text and is_not_video:
-                return (message_text, prev_message)
-        
-        return None
+        return find_description(all_messages, video_index)
 
     async def download_all_videos(self):
         """Baixa todos os vídeos do canal"""
@@ -138,79 +172,298 @@ class VideoDownloader:
             print(f"❌ Erro ao resolver chat/canal: {e}")
             return
         
-        # Buscar todas as mensagens (não apenas vídeos) para encontrar descrições
-        all_messages = []
-        async for message in self.client.get_chat_history(chat_id):
-            all_messages.append(message)
-        video_messages = [msg for msg in all_messages if msg.video or (msg.document and msg.document.mime_type and "video" in msg.document.mime_type)]
+        # Retomar um download completo interrompido, se houver
+        checkpoint = await self._get_checkpoint()
+        offset_id = None
+        if checkpoint:
+            offset_id = checkpoint.resume_offset_id
+            print(f"⏯️  Retomando download interrompido a partir da mensagem {offset_id} "
+                  f"({checkpoint.messages_scanned} mensagens já lidas)")
         
-        print(f"📊 Encontrados {len(video_messages)} vídeos para baixar de {len(all_messages)} mensagens totais")
+        # Percorrer o histórico em fluxo: cada vídeo é enviado para download assim que sua
+        # descrição é resolvida, sem manter todas as mensagens do canal em memória
+        scan_stats = {
+            "messages": 0,
+            "videos": 0,
+            "newest_id": checkpoint.newest_message_id if checkpoint else None,
+            "in_flight": set(),
+            "checkpoint": True,
+            "messages_before": checkpoint.messages_scanned if checkpoint else 0,
+        }
+        summary = await self._scan_and_download(chat_id, scan_stats, offset_id=offset_id)
         
-        downloaded = 0
-        skipped = 0
+        print(f"📊 Histórico percorrido: {scan_stats['videos']} vídeos em {scan_stats['messages']} mensagens")
+        await self._clear_checkpoint()
+        await self._advance_high_water_mark(scan_stats["newest_id"], summary)
+        return summary
+
+    async def sync_new_videos(self):
+        """Sincronização incremental: baixa apenas os vídeos postados após a última execução"""
+        print(f"🔄 Sincronizando novos vídeos do canal {self.channel_name}...")
         
-        for message in video_messages:
-            # Verificar se já foi baixado
-            existing = self.db.query(Video).filter(
-                Video.message_id == message.id
-            ).first()
-            
-            if existing and existing.is_downloaded:
-                print(f"⏭️  Vídeo {message.id} já foi baixado anteriormente. Pulando...")
-                skipped += 1
+        last_message_id = await self._get_high_water_mark()
+        if last_message_id is None:
+            print("ℹ️  Nenhuma sincronização anterior encontrada. Baixando todo o conteúdo do canal...")
+            return await self.download_all_videos()
+        
+        try:
+            chat = await self._resolve_chat()
+            chat_id = chat.id
+        except Exception as e:
+            print(f"❌ Erro ao resolver chat/canal: {e}")
+            return
+        
+        print(f"📌 Última mensagem processada: {last_message_id}")
+        scan_stats = {"messages": 0, "videos": 0, "newest_id": None, "in_flight": set()}
+        summary = await self._scan_and_download(chat_id, scan_stats, min_id=last_message_id)
+        
+        print(f"📊 {scan_stats['videos']} novos vídeos em {scan_stats['messages']} mensagens lidas")
+        await self._advance_high_water_mark(scan_stats["newest_id"], summary)
+        
+        # Aproveitar para tentar de novo os downloads da fila que já podem ser refeitos
+        if not self.enqueue_only:
+            await self.process_jobs()
+        return summary
+
+    async def process_jobs(self, include_failed: bool = False):
+        """Baixa os vídeos da fila cuja próxima tentativa já venceu, sem percorrer o histórico
+        
+        Args:
+            include_failed: Devolve antes para a fila os jobs que esgotaram as tentativas
+        
+        Returns:
+            Resumo dos downloads ou None se não houver nada a fazer
+        """
+        if include_failed:
+            requeued = await self.jobs.retry_failed()
+            if requeued:
+                print(f"🔁 {requeued} downloads que haviam falhado voltaram para a fila")
+        
+        jobs = await self.jobs.claim()
+        return await self.download_claimed_jobs(jobs)
+
+    async def download_claimed_jobs(self, jobs: List[DownloadJob]):
+        """Baixa os vídeos de jobs já reivindicados por este worker (lease em nome dele)
+        
+        Returns:
+            Resumo dos downloads ou None se não houver nada a fazer
+        """
+        if not jobs:
+            return None
+        self.jobs.track(job.message_id for job in jobs)
+        
+        # Jobs cujo vídeo já está no catálogo (por exemplo, baixado por uma varredura posterior)
+        downloaded = await self._load_downloaded_index()
+        await self.jobs.mark_done([job.message_id for job in jobs if job.message_id in downloaded])
+        jobs = [job for job in jobs if job.message_id not in downloaded]
+        if not jobs:
+            return None
+        
+        print(f"📋 {len(jobs)} downloads pendentes na fila do canal {self.channel_name}")
+        try:
+            chat_id = (await self._resolve_chat()).id
+        except Exception as e:
+            print(f"❌ Erro ao resolver chat/canal: {e}")
+            for job in jobs:
+                await self.jobs.finish(job.message_id, False, f"erro ao resolver chat/canal: {e}")
+            return None
+        
+        # Buscar de novo as mensagens dos vídeos e das descrições pelos IDs
+        wanted_ids = sorted({job.message_id for job in jobs} |
+                            {job.description_message_id for job in jobs if job.description_message_id})
+        messages = {}
+        for batch_start in range(0, len(wanted_ids), GET_MESSAGES_LIMIT):
+            batch = await self.client.get_messages(chat_id, wanted_ids[batch_start:batch_start + GET_MESSAGES_LIMIT])
+            messages.update({message.id: message for message in batch if not message.empty})
+        
+        paired_videos = []
+        for job in jobs:
+            video_message = messages.get(job.message_id)
+            if video_message is None or not is_video_message(video_message):
+                print(f"⚠️  Vídeo {job.message_id} não está mais disponível no canal")
+                await self.jobs.give_up(job.message_id, "mensagem não encontrada no canal")
                 continue
-            
-            # Buscar descrição na mensagem anterior (de todas as mensagens)
-            description_result = await self.get_description_from_previous_message(all_messages, message)
-            description = None
-            description_message = None
-            if description_result:
-                description, description_message = description_result
-            
-            title = self.extract_video_title(description) if description else f"Vídeo {message.id}"
-            
-            # Baixar vídeo
-            print(f"⬇️  Baixando: {title[:60]}{'...' if len(title) > 60 else ''}")
-            file_path = await self._download_video(message, title)
-            
-            # Baixar imagem da descrição (se houver)
-            image_path = None
-            if description_message:
-                image_path = await self._download_image(description_message, title)
-                if image_path:
-                    print(f"🖼️  Imagem baixada: {os.path.basename(image_path)}")
-            
-            if file_path:
-                # Salvar informações no banco
-                video_info = message.video or message.document
-                file_unique_id = video_info.file_unique_id if hasattr(video_info, 'file_unique_id') else str(message.id)
+            paired_videos.append(PairedVideo(video_message, job.description, messages.get(job.description_message_id)))
+        
+        async def iterate():
+            for paired in paired_videos:
+                yield paired
+        
+        return await self._download_paired(iterate(), claimed=True)
+
+    async def _scan_and_download(self, chat_id: int, scan_stats: dict, min_id: Optional[int] = None,
+                                 offset_id: Optional[int] = None) -> dict:
+        """Percorre o histórico e baixa os vídeos novos em um pipeline de estágios simultâneos:
+        histórico → pareamento → filtro → transferência → catálogo
+        Com min_id, para logo após passar dessa mensagem: as OLDER_WINDOW mensagens seguintes
+        são lidas apenas para parear os vídeos mais novos e não são baixadas.
+        Com offset_id, começa nas mensagens anteriores a esse ID (retomada de backfill)"""
+        in_flight = scan_stats["in_flight"]
+        pairer = StreamingCaptionPairer()
+        
+        def is_new(message_id: int) -> bool:
+            return (min_id is None or message_id > min_id) and (offset_id is None or message_id < offset_id)
+        
+        async def forward(paired_videos: List[PairedVideo], emit: Emit):
+            for paired in paired_videos:
+                if is_new(paired.video.id):
+                    scan_stats["videos"] += 1
+                    await emit(paired)
+        
+        async def pair(message: Message, emit: Emit):
+            await forward(pairer.feed(message), emit)
+        
+        async def flush(emit: Emit):
+            await forward(pairer.flush(), emit)
+        
+        pipeline = Pipeline(str(self.channel_name))
+        pipeline.add_source("histórico", self._scan_history(chat_id, scan_stats, is_new, min_id, offset_id))
+        pipeline.add_stage("pareamento", pair, finish=flush)
+        return await self._run_download_pipeline(pipeline, in_flight)
+
+    async def _scan_history(self, chat_id: int, scan_stats: dict, is_new, min_id: Optional[int] = None,
+                            offset_id: Optional[int] = None) -> AsyncIterator[Message]:
+        """Fonte do pipeline de varredura: mensagens do histórico, da mais nova para a mais antiga
+        Cada vídeo novo entra em scan_stats["in_flight"] ao ser lido e só sai depois de registrado,
+        então o cursor salvo nunca passa de um vídeo que ainda está em algum estágio do pipeline"""
+        in_flight = scan_stats["in_flight"]
+        overlap = 0
+        
+        if offset_id:
+            # Mensagens logo acima do cursor servem apenas de contexto para o pareamento
+            async for message in self.client.get_chat_history(chat_id, limit=NEWER_WINDOW, offset_id=offset_id,
+                                                              offset=-NEWER_WINDOW):
+                if message.id >= offset_id:
+                    yield message
+        
+        async with aclosing(self._iter_history(chat_id, offset_id)) as history:
+            async for message in history:
+                scan_stats["messages"] += 1
+                self.date_index.observe(message)
+                if scan_stats["newest_id"] is None:
+                    scan_stats["newest_id"] = message.id
+                if is_video_message(message) and is_new(message.id):
+                    in_flight.add(message.id)
                 
-                video_record = Video(
-                    message_id=message.id,
-                    channel_name=str(self.channel_name),
-                    file_name=os.path.basename(file_path),
-                    file_path=file_path,
-                    file_size=video_info.file_size if hasattr(video_info, 'file_size') else 0,
-                    description=description,
-                    image_path=image_path,
-                    message_date=message.date,
-                    is_downloaded=True,
-                    file_unique_id=file_unique_id
-                )
+                yield message
                 
-                self.db.add(video_record)
-                self.db.commit()
+                if min_id is not None and message.id <= min_id:
+                    overlap += 1
+                    if overlap >= OLDER_WINDOW:
+                        break
                 
-                print(f"✅ Vídeo {message.id} baixado com sucesso: {file_path}")
-                downloaded += 1
-            else:
-                print(f"❌ Falha ao baixar vídeo {message.id}")
+                if scan_stats.get("checkpoint") and scan_stats["messages"] % BACKFILL_CHECKPOINT_INTERVAL == 0:
+                    # Tudo acima do vídeo mais novo ainda não concluído já foi processado
+                    resume_offset_id = max(in_flight) + 1 if in_flight else message.id
+                    # Os vídeos concluídos precisam estar no catálogo antes de o cursor passar por eles
+                    await self.catalog.flush()
+                    await self._save_checkpoint(resume_offset_id, scan_stats, message)
+                    await self.date_index.flush()
+        
+        await self.date_index.flush()
+
+    async def _iter_history(self, chat_id: int, offset_id: Optional[int] = None) -> AsyncIterator[Message]:
+        """Mensagens do chat da mais nova para a mais antiga (anteriores a offset_id, se informado)
+        Com HISTORY_SCAN_CONCURRENCY > 1, busca faixas de IDs em paralelo em vez de paginar o histórico"""
+        if HISTORY_SCAN_CONCURRENCY <= 1:
+            async for message in self.client.get_chat_history(chat_id, offset_id=offset_id or 0):
+                yield message
+            return
         
-        print(f"\n📊 Resumo: {downloaded} vídeos baixados, {skipped} pulados")
-        self.db.close()
+        newest_id = offset_id - 1 if offset_id else await get_newest_message_id(self.client, chat_id)
+        async with aclosing(scan_history_by_ids(self.client, chat_id, newest_id)) as history:
+            async for message in history:
+                yield message
 
-    async def _resolve_chat(self):
-        """Resolve o chat/canal antes de buscar mensagens"""
+    async def _get_checkpoint(self) -> Optional[BackfillCheckpoint]:
+        """Cursor salvo de um download completo interrompido (None se não houver)"""
+        channel_name = str(self.channel_name)
+        return await run_db(lambda db: db.get(BackfillCheckpoint, channel_name))
+
+    async def _save_checkpoint(self, resume_offset_id: int, scan_stats: dict, last_message: Message):
+        """Salva o cursor do download completo (seguro para interromper a qualquer momento)"""
+        channel_name = str(self.channel_name)
+        messages_scanned = scan_stats["messages_before"] + scan_stats["messages"]
+        newest_id = scan_stats["newest_id"]
+        
+        def save(db):
+            checkpoint = db.get(BackfillCheckpoint, channel_name)
+            if checkpoint is None:
+                checkpoint = BackfillCheckpoint(channel_name=channel_name, newest_message_id=newest_id)
+                db.add(checkpoint)
+            checkpoint.resume_offset_id = resume_offset_id
+            checkpoint.messages_scanned = messages_scanned
+            checkpoint.last_message_date = last_message.date
+            db.commit()
+        
+        try:
+            await run_db(save)
+        except Exception as e:
+            print(f"⚠️  Erro ao salvar progresso do download: {e}")
+
+    async def _clear_checkpoint(self):
+        """Remove o cursor após o download completo terminar"""
+        channel_name = str(self.channel_name)
+        
+        def clear(db):
+            db.query(BackfillCheckpoint).filter(BackfillCheckpoint.channel_name == channel_name).delete()
+            db.commit()
+        
+        await run_db(clear)
+
+    async def _get_high_water_mark(self) -> Optional[int]:
+        """Maior message_id já processado neste canal (None se nunca sincronizado)"""
+        channel_name = str(self.channel_name)
+        state = await run_db(lambda db: db.get(ChannelSyncState, channel_name))
+        return state.last_message_id if state else None
+
+    async def _advance_high_water_mark(self, newest_id: Optional[int], summary: dict):
+        """Avança a marca d'água do canal após uma varredura completa
+        Vídeos que falharam ficam na fila de downloads; só se a falha não pôde ser registrada
+        na fila a marca fica logo antes do vídeo, para que a próxima varredura o encontre"""
+        if newest_id is None:
+            return
+        
+        if summary["unqueued_ids"]:
+            newest_id = min(summary["unqueued_ids"]) - 1
+        
+        channel_name = str(self.channel_name)
+        
+        def advance(db) -> int:
+            state = db.get(ChannelSyncState, channel_name)
+            if state is None:
+                state = ChannelSyncState(channel_name=channel_name, last_message_id=newest_id)
+                db.add(state)
+            elif newest_id > state.last_message_id:
+                state.last_message_id = newest_id
+            db.commit()
+            return state.last_message_id
+        
+        last_message_id = await run_db(advance)
+        print(f"📌 Marca de sincronização do canal: mensagem {last_message_id}")
+
+    async def _resolve_chat(self, refresh: bool = False):
+        """Resolve o chat/canal antes de buscar mensagens, usando o cache persistente quando possível
+        
+        Args:
+            refresh: Ignora o cache e resolve novamente no Telegram (atualizando a entrada)
+        """
+        if not refresh:
+            cached = await get_cached_chat(self.channel_name)
+            if cached is not None:
+                await restore_peer(self.client, cached)
+                print(f"✅ Chat resolvido (cache): {cached.title or 'Sem título'} (ID: {cached.id}, Tipo: {cached.type.name})")
+                return cached
+        
+        chat = await self._resolve_chat_remote()
+        try:
+            await store_chat(self.client, self.channel_name, chat)
+        except Exception as e:
+            print(f"⚠️  Erro ao salvar chat no cache: {e}")
+        return chat
+
+    async def _resolve_chat_remote(self):
+        """Resolve o chat/canal no Telegram (get_chat, com fallback pelos diálogos)"""
         # Normalizar o channel_name para int se possível
         try:
             channel_id = int(self.channel_name)
@@ -261,7 +514,7 @@ class VideoDownloader:
         try:
             chat = await self._resolve_chat()
             # Usar o ID do chat resolvido
-            chat_id = chat.id
+            chat_id = self._chat_id = chat.id
         except Exception as e:
             raise ValueError(f"Erro ao resolver chat/canal: {e}")
         
@@ -277,17 +530,15 @@ class VideoDownloader:
         search_start = start_date - timedelta(days=1)
         search_start_timestamp = int(search_start.timestamp())
         
-        # Buscar todas as mensagens até a data de fim (incluindo 1 dia antes para títulos)
-        # O Pyrogram get_chat_history com offset_date retorna mensagens até aquela data (em ordem decrescente)
-        all_messages = []
-        async for message in self.client.get_chat_history(chat_id, offset_date=end_date_with_time):
-            msg_timestamp = int(message.date.timestamp())
-            # Se a mensagem é anterior ao início da busca expandida, parar
-            if msg_timestamp < search_start_timestamp:
-                break
-            # Se a mensagem está dentro do período expandido, adicionar
-            if search_start_timestamp <= msg_timestamp <= end_timestamp:
-                all_messages.append(message)
+        # Buscar no Telegram apenas os trechos do período expandido que ainda não estão no cache local
+        missing_ranges = await self.message_cache.missing_ranges(search_start, end_date_with_time)
+        for range_start, range_end in missing_ranges:
+            fetched = await self._fetch_history_range(chat_id, range_start, range_end)
+            await self.message_cache.store(fetched, range_start, range_end)
+        if not missing_ranges:
+            print("💾 Período já está no cache local")
+        
+        all_messages = await self.message_cache.load(search_start, end_date_with_time)
         
         # Filtrar mensagens no período e que são vídeos
         filtered_messages = []
@@ -300,11 +551,63 @@ class VideoDownloader:
                 filtered_messages.append(msg)
                 # Vídeos devem estar dentro do período original
                 if start_timestamp <= msg_timestamp <= end_timestamp:
-                    if msg.video or (msg.document and msg.document.mime_type and "video" in msg.document.mime_type):
+                    if is_video_message(msg):
                         video_messages.append(msg)
         
         return video_messages, filtered_messages
 
+    async def _fetch_history_range(self, chat_id: int, start: datetime, end: datetime) -> List[Message]:
+        """Busca no Telegram todas as mensagens com data entre start e end (inclusive), em ordem decrescente"""
+        print(f"🔍 Buscando mensagens de {start:%d/%m/%Y %H:%M} até {end:%d/%m/%Y %H:%M} no Telegram...")
+        messages = []
+        
+        window = await self.date_index.id_window(start, end)
+        if window:
+            # O índice de datas delimita os IDs do período: buscar exatamente essas mensagens
+            lower_id, upper_id = window
+            async for message in scan_history_by_ids(self.client, chat_id, upper_id - 1, lower_id + 1):
+                self.date_index.observe(message)
+                if start <= message.date <= end:
+                    messages.append(message)
+        else:
+            # O Pyrogram get_chat_history com offset_date retorna mensagens anteriores àquela data (em ordem decrescente)
+            async for message in self.client.get_chat_history(chat_id, offset_date=end + timedelta(seconds=1)):
+                self.date_index.observe(message)
+                if message.date < start:
+                    break
+                if message.date <= end:
+                    messages.append(message)
+        
+        await self.date_index.flush()
+        return messages
+
+    async def _load_full_messages(self, paired_videos: List[PairedVideo]) -> List[PairedVideo]:
+        """Troca as mensagens vindas do cache local pelas mensagens completas do Telegram
+        (necessárias para baixar a mídia); vídeos apagados do canal são descartados"""
+        cached_ids = sorted({message.id for paired in paired_videos
+                             for message in (paired.video, paired.description_message)
+                             if getattr(message, "from_cache", False)})
+        if not cached_ids:
+            return paired_videos
+        
+        chat_id = self._chat_id if self._chat_id is not None else (await self._resolve_chat()).id
+        full_messages = {}
+        for batch_start in range(0, len(cached_ids), GET_MESSAGES_LIMIT):
+            batch = await self.client.get_messages(chat_id, cached_ids[batch_start:batch_start + GET_MESSAGES_LIMIT])
+            full_messages.update({message.id: message for message in batch if not message.empty})
+        
+        loaded = []
+        for video, description, description_message in paired_videos:
+            if getattr(video, "from_cache", False):
+                if video.id not in full_messages:
+                    print(f"⚠️  Vídeo {video.id} não está mais disponível no canal. Pulando...")
+                    continue
+                video = full_messages[video.id]
+            if getattr(description_message, "from_cache", False):
+                description_message = full_messages.get(description_message.id)
+            loaded.append(PairedVideo(video, description, description_message))
+        return loaded
+
     async def download_videos_by_date(self, start_date: datetime, end_date: Optional[datetime] = None):
         """Baixa vídeos de um período específico"""
         if end_date is None:
@@ -317,141 +620,390 @@ class VideoDownloader:
         
         print(f"📊 Encontrados {len(video_messages)} vídeos no período especificado de {len(filtered_messages)} mensagens totais")
         
-        downloaded = 0
-        skipped = 0
+        await self._download_batch(video_messages, filtered_messages)
+
+    async def download_single_video(self, video_message: Message, all_messages: List[Message]):
+        """Baixa um vídeo específico"""
+        description_result = await self.get_description_from_previous_message(all_messages, video_message)
+        if description_result:
+            paired = PairedVideo(video_message, *description_result)
+        else:
+            paired = PairedVideo(video_message, None, None)
         
-        for message in video_messages:
-            # Verificar se já foi baixado
-            existing = self.db.query(Video).filter(
-                Video.message_id == message.id
-            ).first()
-            
-            if existing and existing.is_downloaded:
-                print(f"⏭️  Vídeo {message.id} já foi baixado anteriormente. Pulando...")
-                skipped += 1
-                continue
-            
-            # Buscar descrição na mensagem anterior (de todas as mensagens filtradas)
-            description_result = await self.get_description_from_previous_message(filtered_messages, message)
-            description = None
-            description_message = None
-            if description_result:
-                description, description_message = description_result
-            
-            title = self.extract_video_title(description) if description else f"Vídeo {message.id}"
-            
-            # Baixar vídeo
-            print(f"⬇️  Baixando: {title[:60]}{'...' if len(title) > 60 else ''}")
-            file_path = await self._download_video(message, title)
-            
-            # Baixar imagem da descrição (se houver)
-            image_path = None
-            if description_message:
-                image_path = await self._download_image(description_message, title)
-                if image_path:
-                    print(f"🖼️  Imagem baixada: {os.path.basename(image_path)}")
-            
-            if file_path:
-                # Salvar informações no banco
-                video_info = message.video or message.document
-                file_unique_id = video_info.file_unique_id if hasattr(video_info, 'file_unique_id') else str(message.id)
-                
-                video_record = Video(
-                    message_id=message.id,
-                    channel_name=str(self.channel_name),
-                    file_name=os.path.basename(file_path),
-                    file_path=file_path,
-                    file_size=video_info.file_size if hasattr(video_info, 'file_size') else 0,
-                    description=description,
-                    image_path=image_path,
-                    message_date=message.date,
-                    is_downloaded=True,
-                    file_unique_id=file_unique_id
-                )
-                
-                self.db.add(video_record)
-                self.db.commit()
-                
-                print(f"✅ Vídeo {message.id} baixado com sucesso: {file_path}")
-                downloaded += 1
+        loaded = await self._load_full_messages([paired])
+        if not loaded:
+            return None
+        paired = loaded[0]
+        
+        try:
+            _, file_path = await self._process_video(paired)
+        finally:
+            await self.catalog.flush()
+        return file_path
+
+    async def _download_batch(self, video_messages: List[Message], all_messages: List[Message]):
+        """Baixa uma lista de vídeos com até max_concurrent_downloads transferências simultâneas"""
+        # Parear todos os vídeos com suas descrições em uma única passada pelo histórico
+        wanted_ids = {msg.id for msg in video_messages}
+        paired_videos = [paired for paired in pair_captions(all_messages) if paired.video.id in wanted_ids]
+        paired_videos = await self._load_full_messages(paired_videos)
+        
+        async def iterate():
+            for paired in paired_videos:
+                yield paired
+        
+        return await self._download_paired(iterate())
+
+    async def _download_paired(self, paired_videos: AsyncIterator[PairedVideo], claimed: bool = False):
+        """Baixa vídeos já pareados com até max_concurrent_downloads transferências simultâneas
+        Com claimed, os jobs dos vídeos já foram reivindicados por este worker (fila de downloads)"""
+        pipeline = Pipeline(str(self.channel_name))
+        pipeline.add_source("vídeos", paired_videos)
+        return await self._run_download_pipeline(pipeline, set(), claimed)
+
+    async def _run_download_pipeline(self, pipeline: Pipeline, in_flight: set, claimed: bool = False) -> dict:
+        """Completa o pipeline (cuja fonte produz vídeos pareados) com os estágios de download e o executa:
+        filtro dos já baixados → transferência (max_concurrent_downloads workers) → catálogo e fila.
+        Sem claimed e com enqueue_only, os vídeos apenas são colocados na fila de downloads.
+        Os vídeos saem de in_flight quando o resultado fica registrado"""
+        summary = {"downloaded": 0, "skipped": 0, "failed": 0, "deduplicated": 0, "bytes_saved": 0, "failed_ids": [],
+                   "retry_scheduled": 0, "unqueued_ids": []}
+        enqueue_only = self.enqueue_only and not claimed
+        limits_before = self.client.rate_limiter.snapshot()
+        
+        # Resolver de uma vez quais vídeos do canal já foram baixados
+        await self._load_downloaded_index()
+        
+        async def skip_downloaded(paired: PairedVideo, emit: Emit):
+            if paired.video.id in self._downloaded_index:
+                if not enqueue_only:
+                    print(f"⏭️  Vídeo {paired.video.id} já foi baixado anteriormente. Pulando...")
+                summary["skipped"] += 1
+                in_flight.discard(paired.video.id)
+                return
+            await emit(paired)
+        
+        pipeline.add_stage("filtro", skip_downloaded)
+        if enqueue_only:
+            self._add_enqueue_stage(pipeline, in_flight, summary)
+        else:
+            if not claimed:
+                # Os vídeos encontrados ficam na fila (pending) antes de baixados: se o processo parar,
+                # os que faltam continuam na fila para jobs.py run ou os workers
+                self._add_enqueue_stage(pipeline, in_flight, summary, forward=True)
+            self._add_transfer_stages(pipeline, in_flight, summary, claimed)
+            if self.max_concurrent_downloads > 1:
+                print(f"🚀 Downloads simultâneos: {self.max_concurrent_downloads}")
+            self.catalog.start()
+            # Renovar os leases dos jobs enquanto os downloads estão em andamento
+            self.jobs.start_heartbeat()
+        
+        try:
+            await pipeline.run()
+        finally:
+            summary["pipeline"] = pipeline.snapshot()
+            if enqueue_only:
+                print(f"\n📋 Resumo ({self.channel_name}): {summary['queued']} vídeos colocados na fila de downloads, "
+                      f"{summary['skipped']} já baixados")
             else:
-                print(f"❌ Falha ao baixar vídeo {message.id}")
+                await self.jobs.stop_heartbeat()
+                # Garantir que todos os downloads concluídos fiquem registrados no catálogo
+                await self.catalog.close()
+                print(f"\n📊 Resumo ({self.channel_name}): {summary['downloaded']} vídeos baixados, {summary['skipped']} pulados, {summary['failed']} falharam")
+                if summary["deduplicated"]:
+                    print(f"♻️  {summary['deduplicated']} vídeos reaproveitados de arquivos existentes "
+                          f"({summary['bytes_saved'] / 1024 / 1024:.1f}MB economizados)")
+                if summary["retry_scheduled"]:
+                    print(f"🔁 {summary['retry_scheduled']} downloads com falha agendados para nova tentativa "
+                          f"(python jobs.py run)")
+                summary["rate_limits"] = self.client.rate_limiter.snapshot()
+                print(f"🚦 Limites da API: {self.client.rate_limiter.describe(since=limits_before)}")
+            print(f"⏱️  Pipeline ({pipeline.elapsed():.1f}s): {pipeline.describe()}")
         
-        print(f"\n📊 Resumo: {downloaded} vídeos baixados, {skipped} pulados")
-        self.db.close()
+        # O pós-processamento continua em segundo plano; quem encerra o processo chama media_processor.close()
+        return summary
 
-    async def download_single_video(self, video_message: Message, all_messages: List[Message]):
-        """Baixa um vídeo específico"""
-        # Verificar se já foi baixado
-        existing = self.db.query(Video).filter(
-            Video.message_id == video_message.id
-        ).first()
+    def _add_transfer_stages(self, pipeline: Pipeline, in_flight: set, summary: dict, claimed: bool):
+        """Estágios de transferência (workers simultâneos) e de registro no catálogo e na fila"""
+        async def transfer(paired: PairedVideo, emit: Emit):
+            error = None
+            record = None
+            acquired = True
+            try:
+                # Um job reivindicado pode ter perdido o lease enquanto esperava na fila do worker
+                acquired = await (self.jobs.renew(paired.video.id) if claimed else self.jobs.start(paired))
+                if not acquired:
+                    print(f"⏭️  Vídeo {paired.video.id} está sendo baixado por outro worker. Pulando...")
+                    status = "skipped"
+                elif self.transfer_budget is not None:
+                    async with self.transfer_budget:
+                        status, _, record = await self._transfer_video(paired)
+                else:
+                    status, _, record = await self._transfer_video(paired)
+            except Exception as e:
+                # Falhas são isoladas por vídeo: os demais downloads continuam
+                print(f"❌ Erro inesperado ao processar vídeo {paired.video.id}: {e}")
+                status = "failed"
+                error = str(e)
+            if status == "failed":
+                error = error or self._last_errors.pop(paired.video.id, None) or "falha no download"
+            await emit(TransferResult(paired, status, record, error, acquired))
         
-        if existing and existing.is_downloaded:
-            print(f"⏭️  Vídeo {video_message.id} já foi baixado anteriormente.")
-            return existing.file_path
+        async def register(result: TransferResult, emit: Emit):
+            paired, status = result.paired, result.status
+            # O resultado fica registrado antes de o vídeo deixar de contar como em andamento; o job de um
+            # download concluído só é marcado como done quando o registro for gravado (_catalog_written)
+            try:
+                if result.record is not None:
+                    if result.acquired:
+                        self._awaiting_catalog.add(paired.video.id)
+                    await self.catalog.add(result.record)
+                    job_status = "running"
+                else:
+                    job_status = await self.jobs.finish(paired.video.id, status != "failed", result.error) if result.acquired else "running"
+            except Exception as e:
+                print(f"⚠️  Erro ao atualizar a fila de downloads do vídeo {paired.video.id}: {e}")
+                job_status = None
+            in_flight.discard(paired.video.id)
+            
+            summary[status] += 1
+            if status == "failed":
+                summary["failed_ids"].append(paired.video.id)
+                if job_status == "pending":
+                    summary["retry_scheduled"] += 1
+                elif job_status is None:
+                    summary["unqueued_ids"].append(paired.video.id)
+            elif status == "deduplicated":
+                video_info = paired.video.video or paired.video.document
+                summary["bytes_saved"] += getattr(video_info, 'file_size', 0) or 0
         
-        # Buscar descrição na mensagem anterior
-        description_result = await self.get_description_from_previous_message(all_messages, video_message)
-        description = None
-        description_message = None
-        if description_result:
-            description, description_message = description_result
+        pipeline.add_stage("transferência", transfer, workers=self.max_concurrent_downloads)
+        pipeline.add_stage("catálogo", register)
+
+    def _add_enqueue_stage(self, pipeline: Pipeline, in_flight: set, summary: dict, forward: bool = False):
+        """Estágio que coloca os vídeos na fila de downloads (pending) em lotes
+        Sem forward, os vídeos apenas ficam na fila. Com forward, seguem para a transferência depois de
+        enfileirados; o lote é gravado quando enche ou quando não há mais vídeos esperando na entrada"""
+        summary["queued"] = 0
+        batch: List[PairedVideo] = []
+        
+        async def flush(emit: Emit):
+            if not batch:
+                return
+            await self.jobs.enqueue(batch)
+            summary["queued"] += len(batch)
+            queued = list(batch)
+            batch.clear()
+            if forward:
+                for paired in queued:
+                    await emit(paired)
+            else:
+                in_flight.difference_update(paired.video.id for paired in queued)
+        
+        async def enqueue(paired: PairedVideo, emit: Emit):
+            batch.append(paired)
+            if len(batch) >= JOB_ENQUEUE_BATCH or (forward and stage.depth() == 0):
+                await flush(emit)
+        
+        pipeline.add_stage("fila", enqueue, finish=flush)
+        stage = pipeline.stages[-1]
+
+    async def _catalog_written(self, records: List[dict]):
+        """Chamado pelo CatalogWriter após gravar um lote: conclui os jobs desses vídeos e agenda o pós-processamento"""
+        if self.process_media:
+            media_processor.submit(records)
+        message_ids = [record["message_id"] for record in records if record["message_id"] in self._awaiting_catalog]
+        if not message_ids:
+            return
+        self._awaiting_catalog.difference_update(message_ids)
+        try:
+            await self.jobs.finish_succeeded(message_ids)
+        except Exception as e:
+            # Os vídeos já estão no catálogo: quando o lease vencer, o job é concluído sem novo download
+            print(f"⚠️  Erro ao concluir os jobs de {len(message_ids)} vídeos na fila de downloads: {e}")
+
+    async def _process_video(self, paired: PairedVideo) -> Tuple[str, Optional[str]]:
+        """Baixa um vídeo já pareado com sua descrição (e a imagem da descrição) e registra no banco
+        Retorna uma tupla (status, caminho) onde status é 'downloaded', 'deduplicated', 'skipped' ou 'failed'"""
+        status, file_path, record = await self._transfer_video(paired)
+        if record is not None:
+            await self.catalog.add(record)
+        return status, file_path
+
+    async def _transfer_video(self, paired: PairedVideo) -> Tuple[str, Optional[str], Optional[dict]]:
+        """Baixa um vídeo já pareado com sua descrição (e a imagem da descrição), sem gravar no banco
+        Retorna (status, caminho, registro para o catálogo); o registro é None se não houver o que gravar"""
+        video_message, description, description_message = paired
+        
+        # Verificar se já foi baixado
+        existing_path = await self._get_downloaded_path(video_message.id)
+        if existing_path:
+            print(f"⏭️  Vídeo {video_message.id} já foi baixado anteriormente. Pulando...")
+            return "skipped", existing_path, None
         
         title = self.extract_video_title(description) if description else f"Vídeo {video_message.id}"
+        video_info = video_message.video or video_message.document
+        file_unique_id = video_info.file_unique_id if hasattr(video_info, 'file_unique_id') else str(video_message.id)
         
-        # Baixar vídeo
-        print(f"⬇️  Baixando: {title[:60]}{'...' if len(title) > 60 else ''}")
-        file_path = await self._download_video(video_message, title)
+        # Imagem da descrição (se houver) é baixada em paralelo com o vídeo
+        image_task = asyncio.create_task(self._download_image(description_message, title)) if description_message else None
         
-        # Baixar imagem da descrição (se houver)
-        image_path = None
-        if description_message:
-            image_path = await self._download_image(description_message, title)
-            if image_path:
-                print(f"🖼️  Imagem baixada: {os.path.basename(image_path)}")
+        # O mesmo conteúdo pode já ter sido baixado (ou estar sendo baixado) por outra mensagem
+        in_transfer = _files_in_transfer.get(file_unique_id)
+        existing_file = await asyncio.shield(in_transfer) if in_transfer else await self._find_existing_file(file_unique_id)
+        file_size = getattr(video_info, 'file_size', 0) or 0
+        sha256 = None
+        if existing_file:
+            # O arquivo existente é conferido com o tamanho registrado para ele (o pós-processamento pode
+            # tê-lo reorganizado), não com o informado pelo Telegram
+            existing_size, sha256 = await self._existing_file_state(file_unique_id, existing_file)
+            if check_size(existing_file, existing_size):
+                # Arquivo ausente ou incompleto (ex.: devolvido à fila pela verificação): baixar de novo
+                _files_completed.pop(file_unique_id, None)
+                existing_file = None
+                sha256 = None
+            elif existing_size:
+                file_size = existing_size
+        file_path = self._reuse_existing_file(existing_file, self._video_file_path(video_message, title)) if existing_file else None
         
         if file_path:
-            # Salvar informações no banco
-            video_info = video_message.video or video_message.document
-            file_unique_id = video_info.file_unique_id if hasattr(video_info, 'file_unique_id') else str(video_message.id)
-            
-            video_record = Video(
-                message_id=video_message.id,
-                channel_name=str(self.channel_name),
-                file_name=os.path.basename(file_path),
-                file_path=file_path,
-                file_size=video_info.file_size if hasattr(video_info, 'file_size') else 0,
-                description=description,
-                image_path=image_path,
-                message_date=video_message.date,
-                is_downloaded=True,
-                file_unique_id=file_unique_id
-            )
-            
-            self.db.add(video_record)
-            self.db.commit()
-            
-            print(f"✅ Vídeo {video_message.id} baixado com sucesso: {file_path}")
-            self.db.close()
-            return file_path
+            status = "deduplicated"
+            print(f"♻️  Vídeo {video_message.id} já existe localmente (mesmo conteúdo): {file_path}")
         else:
+            status = "downloaded"
+            transfer = asyncio.get_running_loop().create_future()
+            _files_in_transfer[file_unique_id] = transfer
+            try:
+                print(f"⬇️  Baixando: {title[:60]}{'...' if len(title) > 60 else ''}")
+                file_path = await self._download_video(video_message, title)
+                if file_path:
+                    # Conferir antes que outras mensagens com o mesmo conteúdo reaproveitem o arquivo
+                    sha256 = await self._verify_download(video_message, file_path)
+                    if sha256 is None:
+                        file_path = None
+                    else:
+                        _file_states[file_path] = (file_size, sha256)
+            finally:
+                _files_in_transfer.pop(file_unique_id, None)
+                transfer.set_result(file_path)
+        
+        image_path = await image_task if image_task else None
+        if image_path:
+            print(f"🖼️  Imagem baixada: {os.path.basename(image_path)}")
+        
+        if not file_path:
             print(f"❌ Falha ao baixar vídeo {video_message.id}")
-            self.db.close()
+            return "failed", None, None
+        
+        # Informações a salvar no banco
+        record = dict(
+            message_id=video_message.id,
+            channel_name=str(self.channel_name),
+            file_name=os.path.basename(file_path),
+            file_path=file_path,
+            file_size=file_size,
+            description=description,
+            image_path=image_path,
+            downloaded_at=datetime.utcnow(),
+            message_date=video_message.date,
+            is_downloaded=True,
+            file_unique_id=file_unique_id,
+            sha256=sha256,
+            verified_at=datetime.utcnow() if sha256 else None
+        )
+        
+        if self._downloaded_index is not None:
+            self._downloaded_index[video_message.id] = file_path
+        _files_completed[file_unique_id] = file_path
+        if sha256:
+            _file_states[file_path] = (file_size, sha256)
+        
+        if status == "downloaded":
+            print(f"✅ Vídeo {video_message.id} baixado com sucesso: {file_path}")
+        return status, file_path, record
+
+    async def _find_existing_file(self, file_unique_id: str) -> Optional[str]:
+        """Caminho de um arquivo já baixado com o mesmo conteúdo (qualquer canal)"""
+        if file_unique_id in _files_completed:
+            return _files_completed[file_unique_id]
+        if self._known_files is not None:
+            return self._known_files.get(file_unique_id)
+        
+        existing = await run_db(lambda db: db.query(Video.file_path).filter(
+            Video.file_unique_id == file_unique_id,
+            Video.is_downloaded.is_(True)
+        ).first())
+        return existing[0] if existing else None
+
+    async def _existing_file_state(self, file_unique_id: str, file_path: str) -> Tuple[Optional[int], Optional[str]]:
+        """Tamanho e SHA-256 registrados no catálogo para um arquivo já baixado (ou, se o registro
+        ainda não foi gravado, os conferidos no download feito por este processo)"""
+        row = await run_db(lambda db: db.query(Video.file_size, Video.sha256).filter(
+            Video.file_unique_id == file_unique_id,
+            Video.file_path == file_path,
+            Video.is_downloaded.is_(True)
+        ).first())
+        if row is not None:
+            return row.file_size, row.sha256
+        return _file_states.get(file_path, (None, None))
+
+    @staticmethod
+    def _reuse_existing_file(existing_path: str, target_path: Optional[str]) -> Optional[str]:
+        """Reaproveita um arquivo já baixado: cria um hardlink no caminho de destino ou,
+        se não for possível, usa o próprio caminho existente. None se o arquivo não existe mais"""
+        if not os.path.exists(existing_path):
             return None
+        if not target_path or os.path.abspath(target_path) == os.path.abspath(existing_path):
+            return existing_path
+        if os.path.exists(target_path):
+            # Destino já ocupado: só serve se for o mesmo arquivo
+            return target_path if os.path.samefile(target_path, existing_path) else existing_path
+        try:
+            os.link(existing_path, target_path)
+            return target_path
+        except OSError:
+            # Sistemas de arquivos diferentes ou sem suporte a hardlink: compartilhar o caminho
+            return existing_path
 
-    async def _download_video(self, message: Message, title: str = "") -> Optional[str]:
-        """Baixa o vídeo de uma mensagem com progresso"""
+    async def _load_downloaded_index(self) -> Dict[int, str]:
+        """Carrega de uma vez os vídeos já baixados deste canal (message_id -> caminho)
+        e os arquivos já baixados em qualquer canal (file_unique_id -> caminho)"""
+        channel_name = str(self.channel_name)
+        rows = await run_db(lambda db: db.query(Video.message_id, Video.file_path).filter(
+            Video.channel_name == channel_name,
+            Video.is_downloaded.is_(True)
+        ).all())
+        self._downloaded_index = {message_id: file_path for message_id, file_path in rows}
+        
+        # Conteúdo já baixado em qualquer canal (file_unique_id -> caminho), para deduplicação
+        files = await run_db(lambda db: db.query(Video.file_unique_id, Video.file_path).filter(
+            Video.is_downloaded.is_(True)
+        ).all())
+        self._known_files = {file_unique_id: file_path for file_unique_id, file_path in files}
+        return self._downloaded_index
+
+    async def _get_downloaded_path(self, message_id: int) -> Optional[str]:
+        """Caminho do vídeo se já foi baixado (usa o índice carregado ou consulta apenas esse ID)"""
+        if self._downloaded_index is not None:
+            return self._downloaded_index.get(message_id)
+        
+        channel_name = str(self.channel_name)
+        existing = await run_db(lambda db: db.query(Video).filter(
+            Video.channel_name == channel_name,
+            Video.message_id == message_id
+        ).first())
+        return existing.file_path if existing and existing.is_downloaded else None
+
+    def _video_file_path(self, message: Message, title: str = "") -> Optional[str]:
+        """Caminho de destino do vídeo, baseado no título (ou no nome original/ID)"""
         if not message.video and not message.document:
             return None
         
         # Obter extensão do arquivo original
         original_file_name = None
         if message.video:
-            total_size = message.video.file_size or 0
             original_file_name = message.video.file_name or f"video_{message.id}.mp4"
         elif message.document:
-            total_size = message.document.file_size or 0
             original_file_name = message.document.file_name or f"video_{message.id}.mp4"
         else:
             return None
@@ -477,30 +1029,72 @@ class VideoDownloader:
             # Se não houver título, usar nome original ou ID
             file_name = original_file_name if original_file_name != f"video_{message.id}.mp4" else f"video_{message.id}{ext}"
         
-        file_path = os.path.join(self.videos_path, file_name)
+        return os.path.join(self.videos_path, file_name)
+
+    async def _download_video(self, message: Message, title: str = "") -> Optional[str]:
+        """Baixa o vídeo de uma mensagem com progresso"""
+        file_path = self._video_file_path(message, title)
+        if not file_path:
+            return None
+        
+        video_info = message.video or message.document
+        total_size = video_info.file_size or 0
         
         # Callback de progresso
+        inline_progress = self.max_concurrent_downloads == 1
+        last_step = [-1]
+        
         def progress_callback(current: int, total: int):
             if total > 0:
                 percent = (current / total) * 100
-                # Usar \r para sobrescrever a linha
-                print(f"\r  Progresso: {percent:.1f}% ({current // 1024 // 1024}MB / {total // 1024 // 1024}MB)", end="", flush=True)
+                if inline_progress:
+                    # Usar \r para sobrescrever a linha
+                    print(f"\r  Progresso: {percent:.1f}% ({current // 1024 // 1024}MB / {total // 1024 // 1024}MB)", end="", flush=True)
+                else:
+                    # Com downloads simultâneos, imprimir apenas a cada 25% para não embaralhar as linhas
+                    step = int(percent // 25)
+                    if step > last_step[0]:
+                        last_step[0] = step
+                        print(f"  [{message.id}] Progresso: {percent:.0f}% ({current // 1024 // 1024}MB / {total // 1024 // 1024}MB)", flush=True)
+        
+        # Verifica se é vídeo ou documento de vídeo
+        if not is_video_message(message):
+            return None
         
+        # Baixar em blocos para um arquivo .part, retomando de onde uma tentativa anterior parou
+        # (arquivos grandes são divididos em partes baixadas em paralelo)
         try:
-            # Verifica se é vídeo ou documento de vídeo
-            if message.video:
-                await message.download(file_path, progress=progress_callback)
-                print()  # Nova linha após o progresso
-                return file_path
-            elif message.document and message.document.mime_type and "video" in message.document.mime_type:
-                await message.download(file_path, progress=progress_callback)
+            await download_media(
+                pyrogram_chunk_source(self.client, message),
+                file_path,
+                part_file_path(file_path, message.id),
+                total_size,
+                progress=progress_callback
+            )
+            if inline_progress:
                 print()  # Nova linha após o progresso
-                return file_path
+            return file_path
+        except FloodWait as e:
+            print(f"\n🚦 Vídeo {message.id}: o Telegram continuou pedindo espera ({e.value}s) após várias tentativas")
+            self._last_errors[message.id] = f"FloodWait de {e.value}s"
+            return None
         except Exception as e:
-            print(f"\n❌ Erro ao baixar vídeo: {e}")
+            print(f"\n❌ Erro ao baixar vídeo {message.id}: {e}")
+            self._last_errors[message.id] = str(e)
+            return None
+
+    async def _verify_download(self, message: Message, file_path: str) -> Optional[str]:
+        """Confere o tamanho do arquivo baixado e calcula o SHA-256 (fora do loop de eventos)
+        Retorna o digest ou None se o arquivo estiver incompleto (o arquivo é removido)"""
+        video_info = message.video or message.document
+        try:
+            return await verify_download(file_path, getattr(video_info, 'file_size', 0))
+        except IOError as e:
+            print(f"❌ Vídeo {message.id}: {e}")
+            self._last_errors[message.id] = str(e)
+            if os.path.exists(file_path):
+                os.remove(file_path)
             return None
-        
-        return None
 
     async def _download_image(self, message: Message, title: str = "") -> Optional[str]:
         """Baixa a imagem de uma mensagem (se houver)"""
@@ -534,7 +1128,8 @@ class VideoDownloader:
         file_path = os.path.join(self.videos_path, file_name)
         
         try:
-            await message.download(file_path)
+            # Pelo cliente limitado (vaga e token de download, espera em FloodWait)
+            await self.client.download_media(message, file_name=file_path)
             return file_path
         except Exception as e:
             print(f"\n⚠️  Erro ao baixar imagem: {e}")
@@ -0,0 +1,58 @@
+"""
+Busca textual nos vídeos do catálogo (título e descrição)
+
+A coluna search_vector (gerada pelo PostgreSQL a cada INSERT/UPDATE) guarda o título, extraído
+do nome do arquivo, com peso A e a descrição com peso B, na configuração 'portuguese'
+(radicais: "receita" encontra "receitas"). O índice GIN ix_videos_search_vector atende à busca
+sem percorrer a tabela; os resultados vêm ordenados pela relevância (ts_rank_cd).
+"""
+import os
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import cast, func
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from database import Video, run_db
+
+# Resultados retornados por padrão
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+
+SEARCH_CONFIG = "portuguese"
+
+
+class SearchResult(NamedTuple):
+    channel_name: str
+    message_id: int
+    file_name: Optional[str]
+    file_path: Optional[str]
+    description: Optional[str]
+    message_date: Optional[datetime]
+    is_downloaded: bool
+    rank: float
+
+
+async def search_videos(terms: str, channel_name: Optional[str] = None, limit: int = SEARCH_LIMIT,
+                        downloaded_only: bool = False) -> List[SearchResult]:
+    """Vídeos cujo título ou descrição correspondem aos termos, do mais relevante ao menos relevante
+
+    Os termos seguem a sintaxe de busca da web: palavras (todas obrigatórias), "frase exata",
+    "or" entre alternativas e -palavra para excluir.
+    """
+    query = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), terms)
+    # Pesos padrão: título (A) 1.0 e descrição (B) 0.4; a normalização 32 limita o rank a [0, 1)
+    rank = func.ts_rank_cd(Video.search_vector, query, 32).label("rank")
+
+    def search(db):
+        statement = db.query(Video.channel_name, Video.message_id, Video.file_name, Video.file_path,
+                             Video.description, Video.message_date, Video.is_downloaded, rank).filter(
+            Video.search_vector.bool_op("@@")(query)
+        )
+        if channel_name is not None:
+            statement = statement.filter(Video.channel_name == channel_name)
+        if downloaded_only:
+            statement = statement.filter(Video.is_downloaded.is_(True))
+        return statement.order_by(rank.desc(), Video.message_date.desc()).limit(limit).all()
+
+    rows = await run_db(search)
+    return [SearchResult(*row) for row in rows]
@@ -0,0 +1,174 @@
+"""
+Worker de downloads sem interface: consome a fila persistente (tabela download_jobs)
+
+Vários workers (containers ou processos) podem rodar ao mesmo tempo contra o mesmo banco:
+cada um reivindica lotes de jobs com SELECT ... FOR UPDATE SKIP LOCKED e mantém o lease
+renovado enquanto baixa. Se um worker morrer, seus jobs voltam para a fila quando o lease
+vence (JOB_LEASE_SECONDS) e são retomados por outro.
+
+Para separar varredura e download, rode a varredura com sync_channel.py --enqueue-only.
+
+Uso:
+    docker-compose up -d --scale worker=3
+    python worker.py --once                      # sai quando a fila estiver vazia
+    python worker.py --fake 2000 --seed --once   # teste local com um canal falso (sem Telegram)
+
+Cada worker precisa da sua própria sessão do Telegram, já autenticada: com TELEGRAM_SESSION_NAME
+vazio, o worker usa a primeira sessão livre entre sessions/<WORKER_SESSION_PREFIX>*.session (uma
+trava de arquivo impede que duas réplicas usem a mesma). Para autenticar uma nova sessão:
+    docker-compose run --rm -e TELEGRAM_SESSION_NAME=worker_1 worker python worker.py --once
+"""
+import argparse
+import asyncio
+import fcntl
+import glob
+import os
+import sys
+from typing import IO, Optional, Tuple
+from dotenv import load_dotenv
+from database import init_db
+from job_queue import WORKER_ID, DownloadJobQueue, claim_jobs
+from media_processing import media_processor
+from telegram_client import TelegramClient, load_credentials, parse_channel_name
+from video_downloader import DEFAULT_MAX_CONCURRENT_DOWNLOADS, VideoDownloader
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# Jobs reivindicados por vez e espera entre consultas quando a fila está vazia
+WORKER_CLAIM_BATCH = int(os.getenv("WORKER_CLAIM_BATCH", str(DEFAULT_MAX_CONCURRENT_DOWNLOADS * 2)))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "10"))
+
+# Nome do canal usado pelo modo --fake na fila e no catálogo
+FAKE_CHANNEL_NAME = "fake"
+
+# Sessões do Telegram disponíveis para os workers (sessions/<prefixo>*.session)
+SESSIONS_DIR = "sessions"
+WORKER_SESSION_PREFIX = os.getenv("WORKER_SESSION_PREFIX", "worker")
+
+
+def acquire_session(prefix: str = WORKER_SESSION_PREFIX,
+                    sessions_dir: str = SESSIONS_DIR) -> Optional[Tuple[str, IO]]:
+    """Reserva a primeira sessão sem outro worker usando-a; retorna (nome, trava) ou None
+
+    A trava (flock em <sessão>.lock) fica com o processo até ele terminar: réplicas do mesmo
+    serviço compartilham o diretório de sessões, mas cada uma usa uma sessão diferente.
+    """
+    for session_path in sorted(glob.glob(os.path.join(sessions_dir, f"{glob.escape(prefix)}*.session"))):
+        session_name = os.path.basename(session_path)[:-len(".session")]
+        lock = open(os.path.join(sessions_dir, f"{session_name}.lock"), "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            continue
+        return session_name, lock
+    return None
+
+
+async def run_worker(client, videos_path: str, once: bool = False, batch_size: int = WORKER_CLAIM_BATCH,
+                     poll_seconds: float = WORKER_POLL_SECONDS) -> dict:
+    """Reivindica e baixa jobs da fila até ser interrompido (ou até a fila esvaziar, com once)"""
+    print(f"👷 Worker {WORKER_ID} iniciado (lotes de {batch_size} jobs)")
+    downloaders = {}
+    totals = {"downloaded": 0, "skipped": 0, "failed": 0, "deduplicated": 0}
+
+    while True:
+        jobs = await claim_jobs(batch_size)
+        if not jobs:
+            if once:
+                break
+            await asyncio.sleep(poll_seconds)
+            continue
+
+        by_channel = {}
+        for job in jobs:
+            by_channel.setdefault(job.channel_name, []).append(job)
+
+        for channel_name, channel_jobs in by_channel.items():
+            downloader = downloaders.get(channel_name)
+            if downloader is None:
+                channel = channel_name if channel_name == FAKE_CHANNEL_NAME else parse_channel_name(channel_name)
+                downloader = VideoDownloader(client, channel, videos_path=videos_path)
+                downloaders[channel_name] = downloader
+            # Os canais são baixados um de cada vez: os leases dos que esperam também precisam ser renovados
+            downloader.jobs.track(job.message_id for job in channel_jobs)
+            downloader.jobs.start_heartbeat()
+
+        for channel_name, channel_jobs in by_channel.items():
+            downloader = downloaders[channel_name]
+            print(f"📋 {len(channel_jobs)} jobs reivindicados do canal {channel_name}")
+            try:
+                summary = await downloader.download_claimed_jobs(channel_jobs)
+            finally:
+                await downloader.jobs.stop_heartbeat()
+            if summary:
+                for key in totals:
+                    totals[key] += summary[key]
+
+    print(f"\n👷 Worker {WORKER_ID} encerrado: {totals['downloaded']} baixados, {totals['deduplicated']} reaproveitados, "
+          f"{totals['skipped']} pulados, {totals['failed']} falharam")
+    return totals
+
+
+async def seed_fake_jobs(channel) -> int:
+    """Coloca na fila todos os vídeos do canal falso (modo --fake)"""
+    from caption_pairing import pair_captions
+
+    messages = [channel.message(message_id) for message_id in range(channel.count, 0, -1)]
+    paired_videos = pair_captions([message for message in messages if not message.empty])
+    await DownloadJobQueue(FAKE_CHANNEL_NAME).enqueue(paired_videos)
+    return len(paired_videos)
+
+
+async def main(args) -> int:
+    init_db()
+
+    if args.fake:
+        from fake_telegram import FakeChannel
+
+        client = FakeChannel(args.fake, page_latency=args.fake_latency)
+        if args.seed:
+            print(f"🌱 {await seed_fake_jobs(client)} vídeos do canal falso colocados na fila")
+        totals = await run_worker(client, args.videos_path, once=args.once, batch_size=args.batch)
+        await media_processor.close()
+        return 1 if totals["failed"] else 0
+
+    credentials = load_credentials()
+    if not credentials:
+        return 1
+
+    session_name = os.getenv("TELEGRAM_SESSION_NAME")
+    if not session_name:
+        reserved = acquire_session()
+        if reserved is None:
+            print(f"❌ Nenhuma sessão livre em {SESSIONS_DIR}/{WORKER_SESSION_PREFIX}*.session: autentique uma sessão "
+                  f"por worker (TELEGRAM_SESSION_NAME={WORKER_SESSION_PREFIX}_1, {WORKER_SESSION_PREFIX}_2, ...)")
+            return 1
+        session_name, _session_lock = reserved
+        print(f"🔑 Usando a sessão {session_name}")
+
+    telegram = TelegramClient(*credentials, session_name=session_name)
+    await telegram.connect()
+    try:
+        totals = await run_worker(telegram.client, args.videos_path, once=args.once, batch_size=args.batch)
+        # O pós-processamento dos últimos vídeos roda em paralelo aos downloads; esperar antes de sair
+        await media_processor.close()
+    finally:
+        await telegram.disconnect()
+    return 1 if totals["failed"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de downloads da fila persistente")
+    parser.add_argument("--once", action="store_true", help="Sair quando não houver mais jobs disponíveis")
+    parser.add_argument("--batch", type=int, default=WORKER_CLAIM_BATCH, help="Jobs reivindicados por vez")
+    parser.add_argument("--videos-path", default=os.getenv("VIDEOS_PATH", "/app/videos"),
+                        help="Diretório onde os vídeos são salvos")
+    parser.add_argument("--fake", type=int, metavar="MENSAGENS",
+                        help="Usar um canal falso com esse número de mensagens em vez do Telegram (teste local)")
+    parser.add_argument("--fake-latency", type=float, default=0.05,
+                        help="Latência simulada de cada chamada do canal falso, em segundos")
+    parser.add_argument("--seed", action="store_true", help="Com --fake, colocar na fila todos os vídeos do canal falso")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args)))